@@ -0,0 +1,107 @@
+import random
+import time
+import torch
+from src import SnakeGame
+from src.dqn import DQN, select_action, update_network
+from src.memory import ReplayMemory
+
+#compares how fast (in wall-clock time) each learner setup gets to a usable policy
+#every setup is run with the same seeds so the only difference between the runs is the learner itself
+EPISODES = 1000
+MAX_STEPS = 200
+TARGET_UPDATE_FREQ = 200
+UPDATE_FREQ = 16
+BATCH_SIZE = 128
+GAMMA = 0.99
+SEEDS = [0, 1, 2]
+TARGET_AVG_REWARD = 1.0  #rolling average reward (of agent 1, over 100 episodes) that counts as "converged"
+TIME_BUDGET = 60  #seconds; the rolling average reward at this point compares the learners even when they don't converge
+
+#name: (double, dueling, n_step); the first one is the original learner that the others are compared against
+LEARNERS = {
+    'vanilla': (False, False, 1),
+    'double': (True, False, 1),
+    'double+dueling': (True, True, 1),
+    'double+3-step': (True, False, 3),
+    'double+dueling+3-step': (True, True, 3),
+}
+
+
+def run(seed, double, dueling, n_step):
+    """Trains a fresh pair of agents and returns (seconds to converge or None, avg reward at TIME_BUDGET, final avg reward)."""
+    random.seed(seed)
+    torch.manual_seed(seed)
+
+    game = SnakeGame(render=False)
+    agents = []
+    for _ in range(2):
+        q_network = DQN(13, 128, 4, dueling=dueling)
+        target_network = DQN(13, 128, 4, dueling=dueling)
+        target_network.load_state_dict(q_network.state_dict())
+        optimizer = torch.optim.Adam(q_network.parameters(), lr=0.0001)
+        agents.append([q_network, target_network, optimizer, ReplayMemory(10000, n_step=n_step, gamma=GAMMA)])
+    epsilon = 1.0
+    step_count = 0
+    reward_history = []
+    converged_at = None
+    reward_at_budget = None
+    start_time = time.time()
+
+    for episode in range(EPISODES):
+        game.reset()
+        done1 = done2 = False
+        total_reward1 = 0
+        steps = 0
+        while not (done1 or done2) and steps < MAX_STEPS:
+            state1 = game.get_state(1)
+            state2 = game.get_state(2)
+            action1 = select_action(state1, agents[0][0], epsilon)
+            action2 = select_action(state2, agents[1][0], epsilon)
+            (next_state1, reward1, done1), (next_state2, reward2, done2) = game.step(action1, action2)
+            agents[0][3].push(state1, action1, reward1, next_state1, done1)
+            agents[1][3].push(state2, action2, reward2, next_state2, done2)
+            if step_count % UPDATE_FREQ == 0:
+                for q_network, target_network, optimizer, memory in agents:
+                    update_network(q_network, target_network, optimizer, memory, BATCH_SIZE, double)
+            total_reward1 += reward1
+            step_count += 1
+            steps += 1
+            if step_count % TARGET_UPDATE_FREQ == 0:
+                for q_network, target_network, _, _ in agents:
+                    target_network.load_state_dict(q_network.state_dict())
+            if epsilon > 0.01:
+                epsilon *= 0.9999
+        for agent in agents:
+            agent[3].end_episode()
+        reward_history.append(total_reward1)
+
+        avg_reward = sum(reward_history[-100:]) / min(100, len(reward_history))
+        elapsed_time = time.time() - start_time
+        if converged_at is None and len(reward_history) >= 100 and avg_reward >= TARGET_AVG_REWARD:
+            converged_at = elapsed_time
+        if reward_at_budget is None and elapsed_time >= TIME_BUDGET:
+            reward_at_budget = avg_reward
+
+    avg_reward = sum(reward_history[-100:]) / min(100, len(reward_history))
+    #a run that finishes inside the budget is compared by where it ended
+    if reward_at_budget is None:
+        reward_at_budget = avg_reward
+    return converged_at, reward_at_budget, avg_reward
+
+
+if __name__ == '__main__':
+    baseline = None
+    print(f"{'learner':<24}{'converged':>12}{'at budget':>12}{'final avg':>12}{'speedup':>10}")
+    for name, (double, dueling, n_step) in LEARNERS.items():
+        results = [run(seed, double, dueling, n_step) for seed in SEEDS]
+        converged = [r[0] for r in results if r[0] is not None]
+        #the time to converge only means something when every seed got there, otherwise a learner whose snakes die sooner would look faster
+        time_to_converge = sum(converged) / len(converged) if len(converged) == len(results) else None
+        reward_at_budget = sum(r[1] for r in results) / len(results)
+        final_avg = sum(r[2] for r in results) / len(results)
+        if baseline is None:
+            baseline = time_to_converge
+        converged_text = f'{time_to_converge:.1f}s' if time_to_converge is not None else 'n/a'
+        speedup_text = f'{baseline / time_to_converge:.2f}x' if baseline is not None and time_to_converge is not None else 'n/a'
+        print(f"{name:<24}{converged_text:>12}{reward_at_budget:>12.2f}{final_avg:>12.2f}{speedup_text:>10}"
+              f"  ({len(converged)}/{len(results)} seeds converged)")
@@ -0,0 +1,82 @@
+import os
+import time
+import multiprocessing
+import torch
+from src.dqn import DQN, learn_from_batch
+from src.runtime import configure_runtime, cores_for_process, optimize_model
+
+#finds the best torch thread settings for the learner (batch 128 updates) and the actors (single state forward passes)
+#every setting is run as several processes at the same time, like several training runs sharing one machine
+BATCH_SIZE = 128
+DURATION = 3.0  #seconds each measurement runs for
+THREAD_COUNTS = [1, 2, 4, 8]
+COMPILE_OPTIONS = [False, True]
+
+
+def measure(workload, num_threads, compile, cpu_cores):
+    """Runs one workload for DURATION seconds and returns how many calls per second it managed."""
+    configure_runtime(num_threads, 1, cpu_cores)
+    torch.manual_seed(0)
+    q_network = optimize_model(DQN(13, 128, 4), compile)
+    if workload == 'learner':
+        target_network = optimize_model(DQN(13, 128, 4), compile)
+        optimizer = torch.optim.Adam(q_network.parameters(), lr=0.0001)
+        states = torch.rand(BATCH_SIZE, 13)
+        actions = torch.randint(0, 4, (BATCH_SIZE,))
+        rewards = torch.rand(BATCH_SIZE)
+        next_states = torch.rand(BATCH_SIZE, 13)
+        dones = torch.zeros(BATCH_SIZE)
+
+        def call():
+            learn_from_batch(q_network, target_network, optimizer, states, actions, rewards, next_states, dones, double=True)
+    else:
+        state = torch.rand(13)
+
+        def call():
+            with torch.no_grad():
+                q_network(state).argmax().item()
+
+    #warms up (and compiles) before timing
+    for _ in range(20):
+        call()
+    calls = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < DURATION:
+        call()
+        calls += 1
+    return calls / (time.perf_counter() - start_time)
+
+
+def _worker(args):
+    workload, num_threads, compile, process_index, pin = args
+    cpu_cores = cores_for_process(process_index, num_threads) if pin else None
+    return measure(workload, num_threads, compile, cpu_cores)
+
+
+def run(workload, num_processes, num_threads, compile, pin):
+    """Runs num_processes copies of a workload at once and returns the total calls per second."""
+    args = [(workload, num_threads, compile, i, pin) for i in range(num_processes)]
+    with multiprocessing.get_context('spawn').Pool(num_processes) as pool:
+        return sum(pool.map(_worker, args))
+
+
+if __name__ == '__main__':
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f"{cpu_count} cores available")
+    for workload in ['learner', 'actor']:
+        print(f"\n{workload}")
+        print(f"{'processes':>10}{'threads':>9}{'compile':>9}{'pinned':>8}{'total calls/s':>16}{'per process':>14}")
+        best = None
+        for num_threads in THREAD_COUNTS:
+            if num_threads > cpu_count:
+                continue
+            #fills the machine with as many processes as the thread count allows
+            num_processes = max(1, cpu_count // num_threads)
+            for compile in COMPILE_OPTIONS:
+                for pin in [False, True]:
+                    total = run(workload, num_processes, num_threads, compile, pin)
+                    print(f"{num_processes:>10}{num_threads:>9}{str(compile):>9}{str(pin):>8}{total:>16.0f}{total / num_processes:>14.0f}")
+                    if best is None or total > best[0]:
+                        best = (total, num_processes, num_threads, compile, pin)
+        total, num_processes, num_threads, compile, pin = best
+        print(f"best for {workload}: {num_processes} processes x {num_threads} threads, compile={compile}, pinned={pin} ({total:.0f} calls/s)")
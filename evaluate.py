@@ -0,0 +1,71 @@
+import os
+import time
+import torch
+from src import SnakeGame
+from src.dqn import DQN, select_action
+from src.scripted import POLICIES
+
+#plays the trained agents (without random moves) against every scripted policy as a fixed yardstick for how good they are
+GAMES = 100
+MAX_STEPS = 500
+AGENT_PATHS = {1: 'data/snake_agent1.pth', 2: 'data/snake_agent2.pth'}
+
+
+def play(game, policy1, policy2):
+    """Plays one game and returns (score1, score2, winner) where winner is 1, 2 or 0 for no winner."""
+    game.reset()
+    start_score1 = game.score1
+    start_score2 = game.score2
+    done1 = done2 = False
+    reward1 = reward2 = 0
+    steps = 0
+    while not (done1 or done2) and steps < MAX_STEPS:
+        action1 = policy1(game.game_state, 1)
+        action2 = policy2(game.game_state, 2)
+        (_, reward1, done1), (_, reward2, done2) = game.step(action1, action2)
+        steps += 1
+    winner = 0
+    if done1 or done2:
+        if reward1 > reward2:
+            winner = 1
+        elif reward2 > reward1:
+            winner = 2
+    return game.score1 - start_score1, game.score2 - start_score2, winner
+
+
+def agent_policy(q_network):
+    """Turns a DQN into a policy with the same signature as the scripted ones."""
+    return lambda game_state, snake_num: select_action(game_state.get_state(snake_num), q_network, 0.0)
+
+
+if __name__ == '__main__':
+    game = SnakeGame(render=False)
+    print(f"{'matchup':<28}{'wins':>6}{'losses':>8}{'draws':>7}{'avg score':>11}{'opp score':>11}")
+    for snake_num, path in AGENT_PATHS.items():
+        if not os.path.exists(path):
+            print(f"{path} not found, skipping agent {snake_num}")
+            continue
+        state_dict = torch.load(path)
+        #the architecture is read from the checkpoint, so dueling agents can be evaluated too
+        q_network = DQN(13, 128, 4, dueling='value.weight' in state_dict)
+        q_network.load_weights(state_dict)
+        agent = agent_policy(q_network)
+        for name, policy in POLICIES.items():
+            #the agent always plays from its own side of the board
+            policy1, policy2 = (agent, policy) if snake_num == 1 else (policy, agent)
+            wins = losses = draws = 0
+            agent_score = opponent_score = 0
+            start_time = time.time()
+            for _ in range(GAMES):
+                score1, score2, winner = play(game, policy1, policy2)
+                own, other = (score1, score2) if snake_num == 1 else (score2, score1)
+                agent_score += own
+                opponent_score += other
+                if winner == snake_num:
+                    wins += 1
+                elif winner == 0:
+                    draws += 1
+                else:
+                    losses += 1
+            print(f"{f'agent {snake_num} vs {name}':<28}{wins:>6}{losses:>8}{draws:>7}{agent_score / GAMES:>11.2f}{opponent_score / GAMES:>11.2f}"
+                  f"  ({GAMES / (time.time() - start_time):.0f} games/s)")
@@ -0,0 +1,27 @@
+import time
+import multiprocessing
+from functools import partial
+from src.demos import generate_shard
+
+#plays scripted games in parallel and writes their transitions to disk for pretrain_offline.py
+DEMO_DIR = 'data/demos'
+NUM_SHARDS = 64
+GAMES_PER_SHARD = 50
+MAX_STEPS = 500
+POLICY1 = 'bfs'  #scripted policies for each snake (see src/scripted.py)
+POLICY2 = 'astar'
+EPSILON = 0.1  #chance of a random move so the data also shows what happens after mistakes
+NUM_WORKERS = multiprocessing.cpu_count()
+SEED = 0
+
+if __name__ == '__main__':
+    start_time = time.time()
+    worker = partial(generate_shard, DEMO_DIR, games=GAMES_PER_SHARD, max_steps=MAX_STEPS,
+                     policy1=POLICY1, policy2=POLICY2, epsilon=EPSILON, seed=SEED)
+    total = 0
+    with multiprocessing.Pool(NUM_WORKERS) as pool:
+        #shards are written by the workers as soon as they finish, so only the counts come back
+        for index, count in enumerate(pool.imap_unordered(worker, range(NUM_SHARDS))):
+            total += count
+            print(f"Shard {index + 1}/{NUM_SHARDS} | Transitions: {total} | Speed: {total / (time.time() - start_time):.0f} transitions/s")
+    print(f"Wrote {total} transitions to {DEMO_DIR} in {time.time() - start_time:.1f} seconds.")
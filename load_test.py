@@ -0,0 +1,63 @@
+import asyncio
+import random
+import time
+from src import SnakeGame
+from src.policy_server import PolicyClient
+
+#measures the latency and throughput of a running serve.py with many concurrent clients
+#every client sends one request at a time and waits for the answer, like a game waiting for its next move
+HOST = '127.0.0.1'
+PORT = 8765
+UNIX_SOCKET = None  #has to match serve.py
+AGENTS = ['1', '2']
+CONCURRENT_CLIENTS = [1, 8, 32, 128]
+DURATION = 5.0  #seconds per measurement
+
+
+def sample_states(count):
+    """Collects real game states to send, so the requests look like the ones games would send."""
+    game = SnakeGame(render=False)
+    states = []
+    while len(states) < count:
+        states.append(game.get_state(1))
+        states.append(game.get_state(2))
+        (_, _, done1), (_, _, done2) = game.step(random.randint(0, 3), random.randint(0, 3))
+        if done1 or done2:
+            game.reset()
+    return states
+
+
+async def run_client(states, latencies, deadline):
+    client = PolicyClient()
+    await client.connect(HOST, PORT, UNIX_SOCKET)
+    try:
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            await client.act(random.choice(AGENTS), random.choice(states))
+            latencies.append(time.perf_counter() - start_time)
+    finally:
+        await client.close()
+
+
+async def measure(num_clients, states):
+    latencies = []
+    start_time = time.perf_counter()
+    deadline = start_time + DURATION
+    await asyncio.gather(*(run_client(states, latencies, deadline) for _ in range(num_clients)))
+    elapsed_time = time.perf_counter() - start_time
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return len(latencies) / elapsed_time, p50, p99
+
+
+async def main():
+    states = sample_states(2000)
+    print(f"{'clients':>8}{'requests/s':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    for num_clients in CONCURRENT_CLIENTS:
+        throughput, p50, p99 = await measure(num_clients, states)
+        print(f"{num_clients:>8}{throughput:>12.0f}{p50:>9.2f}{p99:>9.2f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
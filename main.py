@@ -1,111 +1,200 @@
 import pygame
 from src import SnakeGame
 from src.dqn import DQN, select_action, update_network
-from src.memory import ReplayMemory
+from src.memory import ReplayMemory, CompactReplayMemory
+from src.target_network import TargetNetworkUpdater
+from src.runtime import configure_runtime, optimize_model
+from src.checkpoint import has_snapshot, save_snapshot, load_snapshot, METADATA_FILE
+from src.scheduler import EpisodeScheduler
 import numpy as np
 import torch
 import os
 import pickle
+from collections import deque
+
+NUM_THREADS = 1
+CPU_CORES = None
+COMPILE = False
+configure_runtime(NUM_THREADS, 1, CPU_CORES)
 
 # Initialize game and AI components
 
-game = SnakeGame()
+NUM_SNAKES = 2
+game = SnakeGame(num_snakes=NUM_SNAKES)
 
-# Agent 1
-memory1 = ReplayMemory(10000)
-q_network1 = DQN(13, 128, 4)
-target_network1 = DQN(13, 128, 4)
-target_network1.load_state_dict(q_network1.state_dict())
-optimizer1 = torch.optim.Adam(q_network1.parameters(), lr=0.0001)
-epsilon1 = 1.0
+GAMMA = 0.99
+DOUBLE_DQN = True
+DUELING = False
+N_STEP = 3
+AUGMENT = True
+MEMORY_CAPACITY = 10000
+COMPACT_MEMORY = False
+MEMORY_PATHS = [f'data/memory{i}.npz' if COMPACT_MEMORY else f'data/memory{i}.pkl' for i in range(1, NUM_SNAKES + 1)]
 
-# Agent 2
-memory2 = ReplayMemory(10000)
-q_network2 = DQN(13, 128, 4)
-target_network2 = DQN(13, 128, 4)
-target_network2.load_state_dict(q_network2.state_dict())
-optimizer2 = torch.optim.Adam(q_network2.parameters(), lr=0.0001)
-epsilon2 = 1.0
+# One memory, network pair, optimizer and epsilon per agent
+memories = [(CompactReplayMemory if COMPACT_MEMORY else ReplayMemory)(MEMORY_CAPACITY, n_step=N_STEP, gamma=GAMMA) for _ in range(NUM_SNAKES)]
+q_networks = [optimize_model(DQN(13, 128, 4, dueling=DUELING), COMPILE) for _ in range(NUM_SNAKES)]
+target_networks = [optimize_model(DQN(13, 128, 4, dueling=DUELING), COMPILE) for _ in range(NUM_SNAKES)]
+optimizers = [torch.optim.Adam(q_network.parameters(), lr=0.0001) for q_network in q_networks]
+epsilons = [1.0] * NUM_SNAKES
 
 MAX_STEPS = 500
+MAX_STEPS_PER_LENGTH = 50
+MAX_STEPS_CAP = 2000
+STALL_STEPS = 200
+STALL_STEPS_PER_LENGTH = 5
+CYCLE_REPEATS = 3
 TARGET_UPDATE_FREQ = 100
+TAU = 0.01
 UPDATE_FREQ = 4
+SNAPSHOT_PATH = 'data/training_snapshot'
+PRETRAIN_SNAPSHOT_PATH = 'data/pretrain_snapshot'
+SNAPSHOT_EVERY = 100
+STATS_WINDOW = 100  #number of recent episodes the average rewards cover, which is also all the snapshots keep
+WEIGHT_PATHS = [f'data/snake_agent{i}.pth' for i in range(1, NUM_SNAKES + 1)]  #written by pretrain.py and pbt_train.py
+# Where training starts from: 'training_snapshot', 'pretrain_snapshot' or 'weights' (WEIGHT_PATHS with the
+# memories and training_state.pkl), or 'auto' for the first of those that exists, in that order
+LOAD_FROM = 'auto'
 step_count = 0
-reward_history1 = []
-reward_history2 = []
-
-# Load pretrained models if available
-if os.path.exists('data/snake_agent1.pth'):
-    q_network1.load_state_dict(torch.load('data/snake_agent1.pth'))
-    target_network1.load_state_dict(q_network1.state_dict())
-    print('Loaded pretrained weights for Agent 1')
-if os.path.exists('data/snake_agent2.pth'):
-    q_network2.load_state_dict(torch.load('data/snake_agent2.pth'))
-    target_network2.load_state_dict(q_network2.state_dict())
-    print('Loaded pretrained weights for Agent 2')
-
-# Load memory buffers if available
-if os.path.exists('data/memory1.pkl'):
-    memory1.load('data/memory1.pkl')
-    print(f'Loaded memory for Agent 1 ({len(memory1)} experiences)')
-if os.path.exists('data/memory2.pkl'):
-    memory2.load('data/memory2.pkl')
-    print(f'Loaded memory for Agent 2 ({len(memory2)} experiences)')
-
-# Load training state if available
-if os.path.exists('data/training_state.pkl'):
-    with open('data/training_state.pkl', 'rb') as f:
-        training_state = pickle.load(f)
-    epsilon1 = training_state['epsilon1']
-    epsilon2 = training_state['epsilon2']
-    step_count = training_state['step_count']
-    print(f'Loaded training state: epsilon1={epsilon1:.4f}, epsilon2={epsilon2:.4f}, step_count={step_count}')
+episode = 0
+reward_histories = [deque(maxlen=STATS_WINDOW) for _ in range(NUM_SNAKES)]
+
+target_updater = TargetNetworkUpdater(list(zip(q_networks, target_networks)), TAU, TARGET_UPDATE_FREQ)
+target_updater.sync()
+
+# Cuts episodes off at a step limit that grows with the snakes, or once they stall or go in circles
+scheduler = EpisodeScheduler(MAX_STEPS, MAX_STEPS_PER_LENGTH, MAX_STEPS_CAP, STALL_STEPS, STALL_STEPS_PER_LENGTH, CYCLE_REPEATS)
+
+def source_time(source):
+    """Returns when a training source was last written, or None if it doesn't exist."""
+    if source == 'weights':
+        times = [os.path.getmtime(path) for path in WEIGHT_PATHS if os.path.exists(path)]
+        return max(times) if times else None
+    path = SNAPSHOT_PATH if source == 'training_snapshot' else PRETRAIN_SNAPSHOT_PATH
+    return os.path.getmtime(os.path.join(path, METADATA_FILE)) if has_snapshot(path) else None
+
+def weights_differ():
+    """Returns whether any saved agent weights differ from the networks that were just loaded."""
+    for q_network, path in zip(q_networks, WEIGHT_PATHS):
+        if os.path.exists(path):
+            saved = torch.load(path)
+            #a dueling network's value head isn't in weights saved from the plain network, so only the layers both have are compared
+            if any(name in saved and not torch.equal(value, saved[name]) for name, value in q_network.state_dict().items()):
+                return True
+    return False
+
+source_times = {source: source_time(source) for source in ('training_snapshot', 'pretrain_snapshot', 'weights')}
+if LOAD_FROM == 'auto':
+    load_from = next((source for source, written in source_times.items() if written is not None), 'weights')
+elif LOAD_FROM in ('training_snapshot', 'pretrain_snapshot'):
+    if source_times[LOAD_FROM] is None:
+        raise FileNotFoundError(f"LOAD_FROM is {LOAD_FROM!r} but there is no such snapshot")
+    load_from = LOAD_FROM
+elif LOAD_FROM == 'weights':
+    load_from = LOAD_FROM
+else:
+    raise ValueError(f"LOAD_FROM must be 'auto', 'training_snapshot', 'pretrain_snapshot' or 'weights', got {LOAD_FROM!r}")
+
+# Resume from the last snapshot of this script, otherwise carry on from the end of pretrain.py
+# (a snapshot also restores the optimizers, target networks, random number generators and stats)
+if load_from != 'weights':
+    snapshot_path = SNAPSHOT_PATH if load_from == 'training_snapshot' else PRETRAIN_SNAPSHOT_PATH
+    progress = load_snapshot(snapshot_path, q_networks, target_networks, optimizers, memories)
+    step_count = progress['step_count']
+    epsilons = progress['epsilons']
+    game.game_state.scores = progress['scores']
+    # The episode counter and stats of pretrain.py don't carry over
+    if snapshot_path == SNAPSHOT_PATH:
+        episode = progress['episode']
+        reward_histories = [deque(reward_history, maxlen=STATS_WINDOW) for reward_history in progress['reward_histories']]
+    epsilons_text = ', '.join(f'epsilon{i}={epsilon:.4f}' for i, epsilon in enumerate(epsilons, start=1))
+    print(f'Loaded snapshot {snapshot_path}: {epsilons_text}, step_count={step_count}')
+else:
+    # Load pretrained models if available
+    for i, (q_network, weight_path) in enumerate(zip(q_networks, WEIGHT_PATHS), start=1):
+        if os.path.exists(weight_path):
+            q_network.load_weights(torch.load(weight_path))
+            print(f'Loaded pretrained weights for Agent {i}')
+    target_updater.sync()
+
+    # Load memory buffers if available
+    for i, (memory, memory_path) in enumerate(zip(memories, MEMORY_PATHS), start=1):
+        if os.path.exists(memory_path):
+            memory.load(memory_path)
+            print(f'Loaded memory for Agent {i} ({len(memory)} experiences)')
+
+    # Load training state if available
+    if os.path.exists('data/training_state.pkl'):
+        with open('data/training_state.pkl', 'rb') as f:
+            training_state = pickle.load(f)
+        # States saved before the game supported more snakes only have epsilon1 and epsilon2
+        saved_epsilons = training_state.get('epsilons', [training_state.get('epsilon1'), training_state.get('epsilon2')])
+        for i, epsilon in enumerate(saved_epsilons[:NUM_SNAKES]):
+            if epsilon is not None:
+                epsilons[i] = epsilon
+        step_count = training_state['step_count']
+        epsilons_text = ', '.join(f'epsilon{i}={epsilon:.4f}' for i, epsilon in enumerate(epsilons, start=1))
+        print(f'Loaded training state: {epsilons_text}, step_count={step_count}')
+
+# Says which other sources were skipped, so newer weights (from pbt_train.py for example) aren't ignored silently
+# (the weights pretrain.py saves next to its snapshot are the same networks, so they don't count)
+for source, written in source_times.items():
+    if source == load_from or written is None or (source == 'weights' and not weights_differ()):
+        continue
+    newer = source_times[load_from] is None or written > source_times[load_from]
+    print(f"Skipped {source} ({'newer' if newer else 'older'} than {load_from}), set LOAD_FROM = '{source}' to train from it")
+
+def save_training_snapshot():
+    save_snapshot(SNAPSHOT_PATH, q_networks, target_networks, optimizers, memories, {
+        'step_count': step_count,
+        'episode': episode,
+        'epsilons': epsilons,
+        'reward_histories': [list(reward_history) for reward_history in reward_histories],
+        'scores': game.scores,
+    })
 
 def main():
-    global epsilon1, epsilon2, step_count
+    global epsilons, step_count, episode
     running = True
-    episode = 0
     while running:
-        steps = 0
-        total_reward1 = 0
-        total_reward2 = 0
+        total_rewards = [0] * NUM_SNAKES
         game.reset()
-        done1 = False
-        done2 = False
-        while not (done1 or done2) and steps < MAX_STEPS and running:
+        scheduler.reset(game.game_state)
+        done = False
+        truncation = None
+        while not done and truncation is None and running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-            state1 = game.get_state(1)
-            state2 = game.get_state(2)
-            action1 = select_action(state1, q_network1, epsilon1)
-            action2 = select_action(state2, q_network2, epsilon2)
-            (next_state1, reward1, done1), (next_state2, reward2, done2) = game.step(action1, action2)
-            memory1.push(state1, action1, reward1, next_state1, done1)
-            memory2.push(state2, action2, reward2, next_state2, done2)
+            states = [game.get_state(i) for i in range(1, NUM_SNAKES + 1)]
+            actions = [select_action(state, q_network, epsilon) for state, q_network, epsilon in zip(states, q_networks, epsilons)]
+            results = game.step(*actions)
+            for i, (memory, state, action, (next_state, reward, snake_done)) in enumerate(zip(memories, states, actions, results)):
+                memory.push(state, action, reward, next_state, snake_done)
+                total_rewards[i] += reward
+            done = any(snake_done for _, _, snake_done in results)
             
             if step_count % UPDATE_FREQ == 0:
-                update_network(q_network1, target_network1, optimizer1, memory1)
-                update_network(q_network2, target_network2, optimizer2, memory2)
+                for q_network, target_network, optimizer, memory in zip(q_networks, target_networks, optimizers, memories):
+                    update_network(q_network, target_network, optimizer, memory, double=DOUBLE_DQN, augment=AUGMENT)
+                target_updater.step(step_count, UPDATE_FREQ)
             
-            total_reward1 += reward1
-            total_reward2 += reward2
             step_count += 1
-            steps += 1
-            if step_count % TARGET_UPDATE_FREQ == 0:
-                target_network1.load_state_dict(q_network1.state_dict())
-                target_network2.load_state_dict(q_network2.state_dict())
-            if epsilon1 > 0.01:
-                epsilon1 *= 0.9999
-            if epsilon2 > 0.01:
-                epsilon2 *= 0.9999
-        reward_history1.append(total_reward1)
-        reward_history2.append(total_reward2)
+            epsilons = [epsilon * 0.9999 if epsilon > 0.01 else epsilon for epsilon in epsilons]
+            if not done:
+                truncation = scheduler.step(game.game_state)
+        for memory in memories:
+            memory.end_episode()
+        for reward_history, total_reward in zip(reward_histories, total_rewards):
+            reward_history.append(total_reward)
         episode += 1
         if episode % 100 == 0:
-            avg_reward1 = sum(reward_history1[-100:]) / min(100, len(reward_history1))
-            avg_reward2 = sum(reward_history2[-100:]) / min(100, len(reward_history2))
-            print(f"Episode {episode} | AvgR1: {avg_reward1:.2f} | AvgR2: {avg_reward2:.2f}")
+            avg_rewards = [sum(reward_history) / len(reward_history) for reward_history in reward_histories]
+            rewards_text = ' | '.join(f'AvgR{i}: {avg_reward:.2f}' for i, avg_reward in enumerate(avg_rewards, start=1))
+            print(f"Episode {episode} | {rewards_text}")
+        # Snapshots between episodes so resuming continues exactly where this run would have
+        if episode % SNAPSHOT_EVERY == 0 or not running:
+            save_training_snapshot()
 
 if __name__ == "__main__":
     main()
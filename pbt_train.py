@@ -0,0 +1,67 @@
+import os
+import time
+import random
+import multiprocessing
+import torch
+from src.pbt import new_member, train_member, play_match, exploit_and_explore, save_checkpoint, load_checkpoint
+
+#trains a population of agent pairs at once and keeps copying the best ones over the worst ones with perturbed hyperparameters
+#this searches the hyperparameters (learning rate, update frequency, tau, epsilon decay) in one run instead of many separate pretrain.py runs
+POPULATION_SIZE = 8
+ROUNDS = 40
+EPISODES_PER_ROUND = 100
+MAX_STEPS = 200
+BATCH_SIZE = 128
+N_STEP = 3  #has to match N_STEP in main.py and pretrain.py
+GAMMA = 0.99
+EVAL_GAMES = 10  #greedy games per matchup between two members
+EXPLOIT_FRACTION = 0.25  #the bottom quarter is replaced by copies of the top quarter every round
+NUM_WORKERS = multiprocessing.cpu_count()
+CHECKPOINT_PATH = 'data/pbt_checkpoint.pt'  #the run resumes from here if it exists
+SAVE_PATH1 = 'data/snake_agent1.pth'  #the best member's agents are saved here at the end
+SAVE_PATH2 = 'data/snake_agent2.pth'
+SEED = 0
+
+
+def evaluate(pool, members, population_round):
+    """Scores every member by its win balance in a round robin (both sides of the board) against every other member."""
+    matchups = [(i, j) for i in range(len(members)) for j in range(len(members)) if i != j]
+    args = [(members[i]['networks'][0][0], members[j]['networks'][1][0], EVAL_GAMES, 500, SEED + population_round * 1000 + k)
+            for k, (i, j) in enumerate(matchups)]
+    balances = pool.starmap(play_match, args)
+    for member in members:
+        member['score'] = 0.0
+    for (i, j), balance in zip(matchups, balances):
+        members[i]['score'] += balance
+        members[j]['score'] -= balance
+
+
+if __name__ == '__main__':
+    if os.path.exists(CHECKPOINT_PATH):
+        start_round, members = load_checkpoint(CHECKPOINT_PATH)
+        print(f'Resuming population from round {start_round}')
+    else:
+        random.seed(SEED)
+        start_round = 0
+        members = [new_member(i, n_step=N_STEP, gamma=GAMMA) for i in range(POPULATION_SIZE)]
+
+    start_time = time.time()
+    with multiprocessing.get_context('spawn').Pool(NUM_WORKERS) as pool:
+        for population_round in range(start_round, ROUNDS):
+            args = [(member, EPISODES_PER_ROUND, MAX_STEPS, BATCH_SIZE, SEED + population_round * 1000 + member['id']) for member in members]
+            members = pool.starmap(train_member, args)
+            evaluate(pool, members, population_round)
+            best = max(members, key=lambda member: member['score'])
+            print(f"Round {population_round + 1}/{ROUNDS} | Best: member {best['id']} (score {best['score']:.0f}) | "
+                  f"lr={best['hparams']['lr']:.2e} update_freq={best['hparams']['update_freq']} tau={best['hparams']['tau']:.4f} "
+                  f"epsilon_decay={best['hparams']['epsilon_decay']:.5f} | Time: {time.time() - start_time:.1f}s")
+            #every evaluated round is exploited, including the last, so a resumed run with more rounds sees the same population
+            #the best member is never replaced, so the agents saved at the end are still the ones that won the evaluation
+            for loser, winner in exploit_and_explore(members, EXPLOIT_FRACTION):
+                print(f"  member {loser} <- member {winner}")
+            save_checkpoint(CHECKPOINT_PATH, population_round, members)
+
+    best = max(members, key=lambda member: member['score'])
+    torch.save(best['networks'][0][0], SAVE_PATH1)
+    torch.save(best['networks'][1][0], SAVE_PATH2)
+    print(f"Population training complete. Best member {best['id']} saved with hyperparameters {best['hparams']}.")
@@ -1,118 +1,200 @@
+import random
+import numpy as np
 import torch
 from src import SnakeGame
 from src.dqn import DQN, select_action, update_network
-from src.memory import ReplayMemory
+from src.memory import ReplayMemory, CompactReplayMemory
+from src.target_network import TargetNetworkUpdater
+from src.runtime import configure_runtime, optimize_model
+from src.scripted import POLICIES
+from src.checkpoint import has_snapshot, save_snapshot, load_snapshot, snapshot_progress, METADATA_FILE
+from src.scheduler import EpisodeScheduler
 import time
+import os
 import pickle
+from collections import deque
 
 #the pretraining parameters
 EPISODES = 2000  #increased for better learning
-MAX_STEPS = 200  #reduced for faster episodes
-TARGET_UPDATE_FREQ = 200  #less frequent target updates
+MAX_STEPS = 200  #reduced for faster episodes (the limit while the snakes are short)
+MAX_STEPS_PER_LENGTH = 20  #the step limit is at least this times the length of the longest snake, so games where the snakes keep eating aren't cut short
+MAX_STEPS_CAP = 1000
+STALL_STEPS = 100  #cuts off episodes where no snake eats for this many steps (plus STALL_STEPS_PER_LENGTH per segment of the longest snake); None turns it off
+STALL_STEPS_PER_LENGTH = 5
+CYCLE_REPEATS = 3  #cuts off episodes once the whole game has been in the exact same state this many times without anyone eating, since the snakes are going in circles; None turns it off
+TARGET_UPDATE_FREQ = 200  #less frequent target updates (only used when TAU is None)
+TAU = 0.005  #soft target update after every network update; set to None for hard syncs every TARGET_UPDATE_FREQ steps
 UPDATE_FREQ = 16  #update every 16 steps for much faster training
 BATCH_SIZE = 128  #larger batch size for efficiency
-SAVE_PATH1 = 'data/snake_agent1.pth'
-SAVE_PATH2 = 'data/snake_agent2.pth'
-MEMORY_PATH1 = 'data/memory1.pkl'
-MEMORY_PATH2 = 'data/memory2.pkl'
+GAMMA = 0.99  #discount factor for future rewards
+DOUBLE_DQN = True  #uses Double DQN targets to stop Q-values from being overestimated
+DUELING = False  #splits the network output into value and advantage heads (saved plain weights still load, see DQN.load_weights)
+N_STEP = 3  #number of steps each stored reward is summed over
+AUGMENT = True  #randomly flips sampled batches horizontally/vertically, giving 4x the data from the same games
+CURRICULUM_EPISODES = 200  #snakes 2 and up are played by a scripted policy for this many episodes so snake 1 gets real games to learn from early on
+CURRICULUM_POLICY = 'bfs'  #'greedy', 'bfs' or 'astar' (see src/scripted.py)
+WARM_START_PATH = 'data/warm_start.pth'  #weights from pretrain_offline.py, loaded into every agent if the file exists
+WARM_START_EPSILON = 0.2  #the warm started agents already play sensibly, so they start with fewer random moves
+NUM_SNAKES = 2  #number of agents playing against each other (up to 4, see game_config.MAX_SNAKES)
+SAVE_PATHS = [f'data/snake_agent{i}.pth' for i in range(1, NUM_SNAKES + 1)]
+MEMORY_CAPACITY = 10000
+COMPACT_MEMORY = False  #stores each state once in numpy arrays, which makes buffers of a million experiences affordable
+MEMORY_PATHS = [f'data/memory{i}.npz' if COMPACT_MEMORY else f'data/memory{i}.pkl' for i in range(1, NUM_SNAKES + 1)]
 TRAINING_STATE_PATH = 'data/training_state.pkl'
+SNAPSHOT_PATH = 'data/pretrain_snapshot'  #the full training state (optimizers, target networks, RNGs, stats), saved with the stats every 100 episodes
+SEED = None  #seeds python, numpy and torch so a run can be reproduced
+RESUME = True  #continues a stopped pretraining from SNAPSHOT_PATH, giving exactly the same result as an uninterrupted run (a finished one starts over)
 INFO_PATH = 'info/ai_info.txt'
+STATS_WINDOW = 100  #number of recent episodes the averages cover, which is also all the snapshots keep of the histories
+NUM_THREADS = 1  #torch threads for this process; the network is too small to gain from more (see benchmark_runtime.py)
+CPU_CORES = None  #list of cores to pin this process to, useful when running several trainings on one machine
+COMPILE = False  #compiles the networks with torch.compile
 
-#the initial game and AI components
-game = SnakeGame(render=False)
-memory1 = ReplayMemory(10000)
-q_network1 = DQN(13, 128, 4)  #smaller hidden layer for better generalization
-target_network1 = DQN(13, 128, 4)
-target_network1.load_state_dict(q_network1.state_dict())
-optimizer1 = torch.optim.Adam(q_network1.parameters(), lr=0.0001)  #lower learning rate for stability
-epsilon1 = 1.0
-memory2 = ReplayMemory(10000)
-q_network2 = DQN(13, 128, 4)  #smaller hidden layer for better generalization
-target_network2 = DQN(13, 128, 4)
-target_network2.load_state_dict(q_network2.state_dict())
-optimizer2 = torch.optim.Adam(q_network2.parameters(), lr=0.0001)  #lower learning rate for stability
-epsilon2 = 1.0
-
-#overwrites ai_info.txt at the start of the simulation
-with open(INFO_PATH, 'w') as f:
-    f.write('episode,score1,score2,avg_reward1,avg_reward2\n')
+configure_runtime(NUM_THREADS, 1, CPU_CORES)
+if SEED is not None:
+    random.seed(SEED)
+    np.random.seed(SEED)
+    torch.manual_seed(SEED)
+
+#the initial game and AI components (one memory, network pair, optimizer and epsilon per snake)
+game = SnakeGame(render=False, num_snakes=NUM_SNAKES)
+memories = [(CompactReplayMemory if COMPACT_MEMORY else ReplayMemory)(MEMORY_CAPACITY, n_step=N_STEP, gamma=GAMMA) for _ in range(NUM_SNAKES)]
+q_networks = [optimize_model(DQN(13, 128, 4, dueling=DUELING), COMPILE) for _ in range(NUM_SNAKES)]  #smaller hidden layer for better generalization
+target_networks = [optimize_model(DQN(13, 128, 4, dueling=DUELING), COMPILE) for _ in range(NUM_SNAKES)]
+optimizers = [torch.optim.Adam(q_network.parameters(), lr=0.0001) for q_network in q_networks]  #lower learning rate for stability
+epsilons = [1.0] * NUM_SNAKES
+#starts every agent from the offline pretrained weights if they exist
+if os.path.exists(WARM_START_PATH):
+    warm_start = torch.load(WARM_START_PATH)
+    for q_network in q_networks:
+        q_network.load_weights(warm_start)
+    epsilons = [WARM_START_EPSILON] * NUM_SNAKES
+    print(f'Loaded warm start weights from {WARM_START_PATH}')
+
+target_updater = TargetNetworkUpdater(list(zip(q_networks, target_networks)), TAU, TARGET_UPDATE_FREQ)
+target_updater.sync()
+
+scheduler = EpisodeScheduler(MAX_STEPS, MAX_STEPS_PER_LENGTH, MAX_STEPS_CAP, STALL_STEPS, STALL_STEPS_PER_LENGTH, CYCLE_REPEATS)
 
 step_count = 0
-reward_history1 = []
-reward_history2 = []
-episode_lengths = []
+start_episode = 0
+reward_histories = [deque(maxlen=STATS_WINDOW) for _ in range(NUM_SNAKES)]
+episode_lengths = deque(maxlen=STATS_WINDOW)
+
+resume = RESUME and has_snapshot(SNAPSHOT_PATH)
+if resume and snapshot_progress(SNAPSHOT_PATH)['episode'] >= EPISODES:
+    #a run that already reached EPISODES has nothing left to train, so a rerun starts a new one
+    print(f'Ignoring {SNAPSHOT_PATH}, it already finished {EPISODES} episodes; starting a new pretraining')
+    resume = False
+
+if resume:
+    #replaces the fresh (or warm started) agents with the saved ones and restores the random number generators
+    progress = load_snapshot(SNAPSHOT_PATH, q_networks, target_networks, optimizers, memories)
+    step_count = progress['step_count']
+    start_episode = progress['episode']
+    epsilons = progress['epsilons']
+    #snapshots from before the histories were windowed hold every episode, which the deques cut down
+    reward_histories = [deque(reward_history, maxlen=STATS_WINDOW) for reward_history in progress['reward_histories']]
+    episode_lengths = deque(progress['episode_lengths'], maxlen=STATS_WINDOW)
+    scheduler.truncations.update(progress['truncations'])
+    game.game_state.scores = progress['scores']
+    print(f'Resuming pretraining from episode {start_episode} ({SNAPSHOT_PATH})')
+    if os.path.exists(WARM_START_PATH) and os.path.getmtime(WARM_START_PATH) > os.path.getmtime(os.path.join(SNAPSHOT_PATH, METADATA_FILE)):
+        print(f'Skipped {WARM_START_PATH}, which is newer than the snapshot; set RESUME = False to start from it')
+else:
+    #overwrites ai_info.txt at the start of the simulation
+    with open(INFO_PATH, 'w') as f:
+        scores_header = ','.join(f'score{i}' for i in range(1, NUM_SNAKES + 1))
+        rewards_header = ','.join(f'avg_reward{i}' for i in range(1, NUM_SNAKES + 1))
+        f.write(f'episode,{scores_header},{rewards_header}\n')
+
 start_time = time.time()
 
-for episode in range(EPISODES):
+for episode in range(start_episode, EPISODES):
     game.reset()
-    done1 = False
-    done2 = False
-    start_score1 = game.score1
-    start_score2 = game.score2
-    total_reward1 = 0
-    total_reward2 = 0
+    done = False
+    start_scores = list(game.scores)
+    total_rewards = [0] * NUM_SNAKES
     steps = 0
-    while not (done1 or done2) and steps < MAX_STEPS:
-        state1 = game.get_state(1)
-        state2 = game.get_state(2)
-        action1 = select_action(state1, q_network1, epsilon1)
-        action2 = select_action(state2, q_network2, epsilon2)
-        (next_state1, reward1, done1), (next_state2, reward2, done2) = game.step(action1, action2)
-        memory1.push(state1, action1, reward1, next_state1, done1)
-        memory2.push(state2, action2, reward2, next_state2, done2)
+    scheduler.reset(game.game_state)
+    truncation = None
+    while not done and truncation is None:
+        states = [game.get_state(i) for i in range(1, NUM_SNAKES + 1)]
+        actions = [select_action(states[0], q_networks[0], epsilons[0])]
+        for i in range(1, NUM_SNAKES):
+            #the other snakes' memories still store the scripted moves, so they learn from them as demonstrations
+            if episode < CURRICULUM_EPISODES:
+                actions.append(POLICIES[CURRICULUM_POLICY](game.game_state, i + 1))
+            else:
+                actions.append(select_action(states[i], q_networks[i], epsilons[i]))
+        results = game.step(*actions)
+        for i, (memory, state, action, (next_state, reward, snake_done)) in enumerate(zip(memories, states, actions, results)):
+            memory.push(state, action, reward, next_state, snake_done)
+            total_rewards[i] += reward
+        done = any(snake_done for _, _, snake_done in results)
         
         #only updates networks every UPDATE_FREQ steps to speed up the training process
         if step_count % UPDATE_FREQ == 0:
-            update_network(q_network1, target_network1, optimizer1, memory1)
-            update_network(q_network2, target_network2, optimizer2, memory2)
+            for q_network, target_network, optimizer, memory in zip(q_networks, target_networks, optimizers, memories):
+                update_network(q_network, target_network, optimizer, memory, BATCH_SIZE, DOUBLE_DQN, augment=AUGMENT)
+            #updates the target networks (a small step after every update with TAU, otherwise a full copy every TARGET_UPDATE_FREQ steps)
+            target_updater.step(step_count, UPDATE_FREQ)
         
-        total_reward1 += reward1
-        total_reward2 += reward2
         step_count += 1
         steps += 1
         
-        #periodically updates target networks
-        if step_count % TARGET_UPDATE_FREQ == 0:
-            target_network1.load_state_dict(q_network1.state_dict())
-            target_network2.load_state_dict(q_network2.state_dict())
-        
         #lowers epsilon decay
-        if epsilon1 > 0.01:
-            epsilon1 *= 0.9999
-        if epsilon2 > 0.01:
-            epsilon2 *= 0.9999
+        epsilons = [epsilon * 0.9999 if epsilon > 0.01 else epsilon for epsilon in epsilons]
+
+        #cuts the episode off when it hits the step limit or has stalled; this is a truncation, so the experiences above keep done=False
+        if not done:
+            truncation = scheduler.step(game.game_state)
     
+    #stores the n-step experiences left waiting (with their partial returns) if the episode was cut off by the scheduler
+    for memory in memories:
+        memory.end_episode()
+
     episode_lengths.append(steps)
-    reward_history1.append(total_reward1)
-    reward_history2.append(total_reward2)
+    for reward_history, total_reward in zip(reward_histories, total_rewards):
+        reward_history.append(total_reward)
     
     #writes stats every 100 episodes
     if (episode+1) % 100 == 0 or episode == EPISODES-1:
-        score1 = game.score1 - start_score1
-        score2 = game.score2 - start_score2
-        avg_reward1 = sum(reward_history1[-100:]) / min(100, len(reward_history1))
-        avg_reward2 = sum(reward_history2[-100:]) / min(100, len(reward_history2))
-        avg_length = sum(episode_lengths[-100:]) / min(100, len(episode_lengths))
+        scores = [score - start_score for score, start_score in zip(game.scores, start_scores)]
+        avg_rewards = [sum(reward_history) / len(reward_history) for reward_history in reward_histories]
+        avg_length = sum(episode_lengths) / len(episode_lengths)
         elapsed_time = time.time() - start_time
-        episodes_per_second = (episode + 1) / elapsed_time
-        memory_size1 = len(memory1)
-        memory_size2 = len(memory2)
+        episodes_per_second = (episode + 1 - start_episode) / elapsed_time
+        memory_sizes = '/'.join(str(len(memory)) for memory in memories)
         with open(INFO_PATH, 'a') as f:
-            f.write(f"{episode+1},{score1},{score2},{avg_reward1:.2f},{avg_reward2:.2f}\n")
-        print(f"Episode {episode+1}/{EPISODES} | Score1: {score1} | Score2: {score2} | AvgR1: {avg_reward1:.2f} | AvgR2: {avg_reward2:.2f} | AvgLen: {avg_length:.1f} | Speed: {episodes_per_second:.1f} ep/s | Mem: {memory_size1}/{memory_size2}")
+            f.write(f"{episode+1},{','.join(map(str, scores))},{','.join(f'{avg_reward:.2f}' for avg_reward in avg_rewards)}\n")
+        scores_text = ' | '.join(f'Score{i}: {score}' for i, score in enumerate(scores, start=1))
+        rewards_text = ' | '.join(f'AvgR{i}: {avg_reward:.2f}' for i, avg_reward in enumerate(avg_rewards, start=1))
+        cuts_text = '/'.join(str(scheduler.truncations[reason]) for reason in ('max_steps', 'stall', 'cycle'))
+        print(f"Episode {episode+1}/{EPISODES} | {scores_text} | {rewards_text} | AvgLen: {avg_length:.1f} | Cut (max/stall/cycle): {cuts_text} | Speed: {episodes_per_second:.1f} ep/s | Mem: {memory_sizes}")
+
+        #snapshots right after the stats line so a resumed run doesn't write any line twice
+        save_snapshot(SNAPSHOT_PATH, q_networks, target_networks, optimizers, memories, {
+            'step_count': step_count,
+            'episode': episode + 1,
+            'epsilons': epsilons,
+            'reward_histories': [list(reward_history) for reward_history in reward_histories],
+            'episode_lengths': list(episode_lengths),
+            'truncations': dict(scheduler.truncations),
+            'scores': game.scores,
+        })
 
 #saves the trained models
-torch.save(q_network1.state_dict(), SAVE_PATH1)
-torch.save(q_network2.state_dict(), SAVE_PATH2)
+for q_network, save_path in zip(q_networks, SAVE_PATHS):
+    torch.save(q_network.state_dict(), save_path)
 
 #saves the memory buffers
-memory1.save(MEMORY_PATH1)
-memory2.save(MEMORY_PATH2)
+for memory, memory_path in zip(memories, MEMORY_PATHS):
+    memory.save(memory_path)
 
 #saves the training state (from the epsilon values and step count)
 training_state = {
-    'epsilon1': epsilon1,
-    'epsilon2': epsilon2,
+    'epsilons': epsilons,
     'step_count': step_count
 }
 with open(TRAINING_STATE_PATH, 'wb') as f:
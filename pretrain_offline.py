@@ -0,0 +1,48 @@
+import time
+import torch
+from src.dqn import DQN, behavior_cloning_step, learn_from_batch
+from src.demos import ShardLoader
+from src.target_network import TargetNetworkUpdater
+
+#pretrains a DQN from the demonstrations written by generate_demos.py before any online self-play
+#first it copies the scripted moves (behavior cloning), then it learns Q-values from the same data (offline Q-learning)
+DEMO_DIR = 'data/demos'
+WARM_START_PATH = 'data/warm_start.pth'  #pretrain.py loads this into both agents if it exists
+BC_EPOCHS = 2
+Q_EPOCHS = 3
+BATCH_SIZE = 256
+LEARNING_RATE = 0.0005
+GAMMA = 0.99
+DOUBLE_DQN = True
+TAU = 0.005
+DUELING = False  #has to match DUELING in pretrain.py and main.py
+SEED = 0  #seeds the network initialization and the batch order
+
+torch.manual_seed(SEED)
+loader = ShardLoader(DEMO_DIR, BATCH_SIZE, seed=SEED)
+q_network = DQN(13, 128, 4, dueling=DUELING)
+target_network = DQN(13, 128, 4, dueling=DUELING)
+target_updater = TargetNetworkUpdater([(q_network, target_network)], TAU)
+target_updater.sync()
+optimizer = torch.optim.Adam(q_network.parameters(), lr=LEARNING_RATE)
+start_time = time.time()
+
+for epoch in range(BC_EPOCHS + Q_EPOCHS):
+    cloning = epoch < BC_EPOCHS
+    if epoch == BC_EPOCHS:
+        #the Q-learning starts from the cloned policy
+        target_updater.sync()
+    total_loss = 0.0
+    batches = 0
+    for states, actions, rewards, next_states, dones in loader:
+        if cloning:
+            total_loss += behavior_cloning_step(q_network, optimizer, states, actions)
+        else:
+            total_loss += learn_from_batch(q_network, target_network, optimizer, states, actions, rewards, next_states, dones, GAMMA, DOUBLE_DQN)
+            target_updater.step(batches)
+        batches += 1
+    elapsed_time = time.time() - start_time
+    print(f"Epoch {epoch + 1}/{BC_EPOCHS + Q_EPOCHS} ({'cloning' if cloning else 'Q-learning'}) | Loss: {total_loss / max(1, batches):.4f} | Speed: {batches * BATCH_SIZE * (epoch + 1) / elapsed_time:.0f} transitions/s")
+
+torch.save(q_network.state_dict(), WARM_START_PATH)
+print(f"Offline pretraining complete in {time.time() - start_time:.1f} seconds. Saved to {WARM_START_PATH}.")
@@ -1,13 +1,30 @@
 import os
+import shutil
 
 #paths to all the snake player data files
 FILES_TO_DELETE = [
     'data/memory1.pkl',      # Agent 1's replay memory
     'data/memory2.pkl',      # Agent 2's replay memory
+    'data/memory1.npz',      # Agent 1's compact replay memory
+    'data/memory2.npz',      # Agent 2's compact replay memory
     'data/snake_agent1.pth', # Agent 1's neural network weights
     'data/snake_agent2.pth', # Agent 2's neural network weights
+    'data/memory3.pkl',      # Agents 3 and 4 (only used when NUM_SNAKES is above 2)
+    'data/memory4.pkl',
+    'data/memory3.npz',
+    'data/memory4.npz',
+    'data/snake_agent3.pth',
+    'data/snake_agent4.pth',
     'info/ai_info.txt',      # Training statistics
-    'data/training_state.pkl' # Training state (epsilon values, step count)
+    'data/training_state.pkl', # Training state (epsilon values, step count)
+    'data/warm_start.pth',   # Offline pretrained weights from pretrain_offline.py
+    'data/pbt_checkpoint.pt' # Population training checkpoint from pbt_train.py
+]
+
+#snapshot directories holding the full training state (see src/checkpoint.py)
+DIRECTORIES_TO_DELETE = [
+    'data/pretrain_snapshot', # pretrain.py's snapshot
+    'data/training_snapshot', # main.py's snapshot
 ]
 
 print("Resetting all snake player data...")
@@ -19,5 +36,12 @@ for file in FILES_TO_DELETE:
     else:
         print(f"{file} does not exist (already reset)")
 
+for directory in DIRECTORIES_TO_DELETE:
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+        print(f"Deleted {directory}")
+    else:
+        print(f"{directory} does not exist (already reset)")
+
 print("\nAll snake data has been reset!")
 print("Run pretrain.py to train the snakes from scratch, or run main.py to start with untrained snakes.") 
\ No newline at end of file
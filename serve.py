@@ -0,0 +1,22 @@
+import asyncio
+from src.policy_server import PolicyServer
+from src.runtime import configure_runtime
+
+#serves the trained agents to any number of games over a socket, see src/policy_server.py for the protocol
+#the checkpoints are reloaded automatically when training writes new ones
+HOST = '127.0.0.1'
+PORT = 8765
+UNIX_SOCKET = None  #a path like '/tmp/snake_policy.sock' to serve on a Unix socket instead of TCP
+CHECKPOINTS = {'1': 'data/snake_agent1.pth', '2': 'data/snake_agent2.pth'}
+MAX_BATCH = 256  #most requests answered by one forward pass
+MAX_DELAY = 0.002  #longest a request waits for others to batch with (seconds)
+RELOAD_INTERVAL = 1.0  #how often the checkpoints are checked for changes (seconds)
+NUM_THREADS = 1
+
+if __name__ == '__main__':
+    configure_runtime(NUM_THREADS, 1)
+    server = PolicyServer(CHECKPOINTS, MAX_BATCH, MAX_DELAY, RELOAD_INTERVAL)
+    try:
+        asyncio.run(server.serve(HOST, PORT, UNIX_SOCKET))
+    except KeyboardInterrupt:
+        print(f"Stopped after {server.requests_served} requests in {server.batches_served} batches.")
@@ -0,0 +1,213 @@
+"""
+Versioned snapshots of a whole training run, so a stopped run can be resumed exactly where it left off.
+
+A snapshot is a directory holding:
+    metadata.json          the format version, counters, epsilons, metric histories,
+                           RNG states and the non-tensor parts of the optimizers
+    tensors.safetensors    every network, target network and optimizer tensor
+                           (tensors.pt when the safetensors package isn't installed)
+    memory1.pkl, ...       the replay memories in their own save format (.npz for CompactReplayMemory)
+
+Snapshots are meant to be taken between episodes, when no n-step experience is
+waiting in a memory, so loading one and carrying on gives exactly the same
+results as never having stopped.
+"""
+
+import json
+import os
+import random
+import shutil
+import numpy as np
+import torch
+
+from .memory import CompactReplayMemory
+
+try:
+    from safetensors.torch import save_file, load_file
+except ImportError:
+    save_file = load_file = None
+
+#bumped whenever the layout changes, snapshots of another version are refused instead of half loaded
+FORMAT_VERSION = 1
+METADATA_FILE = 'metadata.json'
+
+
+def has_snapshot(path):
+    """Returns whether a complete snapshot exists at path."""
+    return os.path.exists(os.path.join(path, METADATA_FILE))
+
+
+def snapshot_progress(path):
+    """Returns the progress dictionary of the snapshot at path without loading anything else."""
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        return json.load(f)['progress']
+
+
+def _memory_file(index, memory):
+    extension = 'npz' if isinstance(memory, CompactReplayMemory) else 'pkl'
+    return f'memory{index + 1}.{extension}'
+
+
+def _rng_state():
+    """Returns the Python and NumPy RNG states as JSON values and the torch RNG state as a tensor."""
+    version, internal_state, gauss_next = random.getstate()
+    bit_generator, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    metadata = {
+        'python': [version, list(internal_state), gauss_next],
+        'numpy': [bit_generator, keys.tolist(), position, has_gauss, cached_gaussian],
+    }
+    return metadata, torch.get_rng_state()
+
+
+def _set_rng_state(metadata, torch_state):
+    version, internal_state, gauss_next = metadata['python']
+    random.setstate((version, tuple(internal_state), gauss_next))
+    bit_generator, keys, position, has_gauss, cached_gaussian = metadata['numpy']
+    np.random.set_state((bit_generator, np.array(keys, dtype=np.uint32), position, has_gauss, cached_gaussian))
+    torch.set_rng_state(torch_state)
+
+
+def _split_optimizer_state(index, optimizer, tensors):
+    """Moves the optimizer's tensors into tensors and returns the rest of its state dict as JSON values."""
+    state_dict = optimizer.state_dict()
+    values = {}
+    for param_id, param_state in state_dict['state'].items():
+        values[str(param_id)] = {}
+        for name, value in param_state.items():
+            if torch.is_tensor(value):
+                tensors[f'optimizer{index}.state.{param_id}.{name}'] = value
+            else:
+                values[str(param_id)][name] = value
+    return {'param_groups': state_dict['param_groups'], 'values': values}
+
+
+def _join_optimizer_state(index, metadata, tensors):
+    """Rebuilds an optimizer state dict from its JSON values and tensors."""
+    state = {}
+    for param_id, values in metadata['values'].items():
+        state[int(param_id)] = dict(values)
+    prefix = f'optimizer{index}.state.'
+    for key, value in tensors.items():
+        if key.startswith(prefix):
+            param_id, name = key[len(prefix):].split('.', 1)
+            state.setdefault(int(param_id), {})[name] = value
+    return {'state': state, 'param_groups': metadata['param_groups']}
+
+
+def save_snapshot(path, q_networks, target_networks, optimizers, memories, progress):
+    """
+    Saves everything needed to resume training into the snapshot directory at path.
+
+    The snapshot is written to a temporary directory that then replaces the old
+    one, so an interrupted save never leaves a broken snapshot behind.
+
+    Args:
+        path (str): The snapshot directory.
+        q_networks (list): The Q-network of every agent.
+        target_networks (list): The target network of every agent.
+        optimizers (list): The optimizer of every agent.
+        memories (list): The replay memory of every agent.
+        progress (dict): The rest of the training state (step and episode counters, epsilons,
+            metric histories, scores...), which has to be JSON serializable.
+    """
+    temp_path = path + '.tmp'
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+
+    tensors = {}
+    optimizer_metadata = []
+    for i, (q_network, target_network, optimizer) in enumerate(zip(q_networks, target_networks, optimizers)):
+        for name, tensor in q_network.state_dict().items():
+            tensors[f'q_network{i}.{name}'] = tensor
+        for name, tensor in target_network.state_dict().items():
+            tensors[f'target_network{i}.{name}'] = tensor
+        optimizer_metadata.append(_split_optimizer_state(i, optimizer, tensors))
+    rng_metadata, tensors['rng.torch'] = _rng_state()
+    #safetensors refuses tensors that share memory or aren't contiguous, so every tensor gets its own copy
+    tensors = {key: tensor.detach().contiguous().clone() for key, tensor in tensors.items()}
+
+    if save_file is not None:
+        tensor_file = 'tensors.safetensors'
+        save_file(tensors, os.path.join(temp_path, tensor_file))
+    else:
+        tensor_file = 'tensors.pt'
+        torch.save(tensors, os.path.join(temp_path, tensor_file))
+
+    memory_files = [_memory_file(i, memory) for i, memory in enumerate(memories)]
+    for memory, memory_file in zip(memories, memory_files):
+        memory.save(os.path.join(temp_path, memory_file))
+
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'num_agents': len(q_networks),
+        'tensor_file': tensor_file,
+        'memory_files': memory_files,
+        'optimizers': optimizer_metadata,
+        'rng': rng_metadata,
+        'progress': progress,
+    }
+    #the metadata is written last, since has_snapshot treats a directory without it as incomplete
+    with open(os.path.join(temp_path, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f)
+
+    old_path = path + '.old'
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(temp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def load_snapshot(path, q_networks, target_networks, optimizers, memories):
+    """
+    Loads a snapshot saved by save_snapshot into the given agents and restores the RNG states.
+
+    Args:
+        path (str): The snapshot directory.
+        q_networks (list): The Q-network of every agent.
+        target_networks (list): The target network of every agent.
+        optimizers (list): The optimizer of every agent.
+        memories (list): The replay memory of every agent.
+
+    Returns:
+        dict: The progress dictionary that was saved with the snapshot.
+
+    Raises:
+        ValueError: If the snapshot has another format version, number of agents, network architecture
+            (plain or dueling) or kind of memory.
+    """
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"Snapshot {path} has format version {metadata['format_version']}, expected {FORMAT_VERSION}")
+    if metadata['num_agents'] != len(q_networks):
+        raise ValueError(f"Snapshot {path} has {metadata['num_agents']} agents, expected {len(q_networks)}")
+    if metadata['memory_files'] != [_memory_file(i, memory) for i, memory in enumerate(memories)]:
+        raise ValueError(f"Snapshot {path} was saved with another kind of replay memory")
+
+    tensor_path = os.path.join(path, metadata['tensor_file'])
+    if metadata['tensor_file'].endswith('.safetensors'):
+        if load_file is None:
+            raise ValueError(f"Snapshot {path} was saved with safetensors, which isn't installed")
+        tensors = load_file(tensor_path)
+    else:
+        tensors = torch.load(tensor_path, weights_only=True)
+
+    #the optimizer state only fits the architecture it was saved with, so a snapshot is never converted like DQN.load_weights does
+    for i, q_network in enumerate(q_networks):
+        saved_dueling = f'q_network{i}.value.weight' in tensors
+        if saved_dueling != q_network.dueling:
+            raise ValueError(f"Snapshot {path} was saved with dueling={saved_dueling}, but the networks have dueling={q_network.dueling}")
+
+    for i, (q_network, target_network, optimizer) in enumerate(zip(q_networks, target_networks, optimizers)):
+        q_prefix, target_prefix = f'q_network{i}.', f'target_network{i}.'
+        q_network.load_state_dict({key[len(q_prefix):]: value for key, value in tensors.items() if key.startswith(q_prefix)})
+        target_network.load_state_dict({key[len(target_prefix):]: value for key, value in tensors.items() if key.startswith(target_prefix)})
+        optimizer.load_state_dict(_join_optimizer_state(i, metadata['optimizers'][i], tensors))
+
+    for memory, memory_file in zip(memories, metadata['memory_files']):
+        memory.load(os.path.join(path, memory_file))
+
+    _set_rng_state(metadata['rng'], tensors['rng.torch'])
+    return metadata['progress']
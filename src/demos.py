@@ -0,0 +1,190 @@
+"""
+Demonstration datasets: generating scripted games into binary shards and streaming them back as training batches.
+
+A shard is a single .npy file holding a structured array of transitions, so
+it can be memory mapped instead of read into memory all at once.
+"""
+
+import os
+import glob
+import queue
+import random
+import threading
+import numpy as np
+import torch
+
+from .snake import SnakeGame
+from .scripted import POLICIES
+from .dqn import legal_actions
+
+#every transition takes a fixed 110 bytes: two float32 state vectors, the action, the reward and the done flag
+TRANSITION_DTYPE = np.dtype([
+    ('state', np.float32, (13,)),
+    ('action', np.uint8),
+    ('reward', np.float32),
+    ('next_state', np.float32, (13,)),
+    ('done', np.bool_),
+])
+
+
+def shard_path(directory, index):
+    """Returns the path of the index-th shard in directory."""
+    return os.path.join(directory, f'shard_{index:05d}.npy')
+
+
+def generate_shard(directory, index, games, max_steps=500, policy1='bfs', policy2='astar', epsilon=0.1, seed=0):
+    """
+    Plays games with two scripted policies and writes every transition from both snakes into one shard.
+
+    Args:
+        directory (str): The directory the shard is written to.
+        index (int): The number of the shard, which also offsets the seed.
+        games (int): The number of games to play.
+        max_steps (int): The number of steps before a game is cut off.
+        policy1 (str): The scripted policy for snake 1 (see scripted.POLICIES).
+        policy2 (str): The scripted policy for snake 2.
+        epsilon (float): The probability of a random move, so the data also covers mistakes.
+        seed (int): The base random seed.
+
+    Returns:
+        int: The number of transitions written.
+    """
+    random.seed(seed + index)
+    game = SnakeGame(render=False)
+    policies = (POLICIES[policy1], POLICIES[policy2])
+    transitions = []
+    for _ in range(games):
+        game.reset()
+        done1 = done2 = False
+        steps = 0
+        while not (done1 or done2) and steps < max_steps:
+            state1 = game.get_state(1)
+            state2 = game.get_state(2)
+            actions = []
+            for snake_num, (policy, state) in enumerate(zip(policies, (state1, state2)), start=1):
+                if random.random() < epsilon:
+                    actions.append(random.choice(legal_actions(state)))
+                else:
+                    actions.append(policy(game.game_state, snake_num))
+            (next_state1, reward1, done1), (next_state2, reward2, done2) = game.step(*actions)
+            transitions.append((state1, actions[0], reward1, next_state1, done1))
+            transitions.append((state2, actions[1], reward2, next_state2, done2))
+            steps += 1
+
+    os.makedirs(directory, exist_ok=True)
+    path = shard_path(directory, index)
+    #writes to a temporary file first so a half written shard is never picked up by a loader
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, np.array(transitions, dtype=TRANSITION_DTYPE))
+    os.replace(temp_path, path)
+    return len(transitions)
+
+
+class ShardLoader:
+    """
+    Streams shuffled batches of transitions from shards on disk.
+
+    A background thread reads and shuffles the shards and builds the batch
+    tensors ahead of time, so the training loop doesn't wait on the disk. If
+    the loop stops early, the thread is stopped when the iterator is closed
+    (or garbage collected) or when close() is called.
+    """
+
+    def __init__(self, directory, batch_size=128, prefetch=8, shuffle=True, seed=None):
+        """
+        Args:
+            directory (str): The directory containing the shards.
+            batch_size (int): The number of transitions per batch.
+            prefetch (int): The number of batches prepared ahead of time.
+            shuffle (bool): If True, shuffles the shard order and the transitions within each shard.
+            seed (int): Seeds the loader's own shuffling generator, so the batch order can be reproduced.
+        """
+        self.paths = sorted(glob.glob(os.path.join(directory, 'shard_*.npy')))
+        if not self.paths:
+            raise FileNotFoundError(f"No shards found in {directory}")
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.stops = set()
+
+    def __len__(self):
+        """Returns the number of batches in one pass over every shard."""
+        return sum(len(np.load(path, mmap_mode='r')) // self.batch_size for path in self.paths)
+
+    def num_transitions(self):
+        """Returns the total number of transitions in all shards."""
+        return sum(len(np.load(path, mmap_mode='r')) for path in self.paths)
+
+    def _batches(self):
+        paths = list(self.paths)
+        if self.shuffle:
+            paths = [paths[i] for i in self.rng.permutation(len(paths))]
+        for path in paths:
+            shard = np.load(path, mmap_mode='r')
+            order = self.rng.permutation(len(shard)) if self.shuffle else np.arange(len(shard))
+            #the last partial batch of each shard is dropped to keep every batch the same size
+            for start in range(0, len(order) - self.batch_size + 1, self.batch_size):
+                batch = shard[np.sort(order[start:start + self.batch_size])]
+                yield (
+                    torch.from_numpy(np.ascontiguousarray(batch['state'])),
+                    torch.from_numpy(batch['action'].astype(np.int64)),
+                    torch.from_numpy(np.ascontiguousarray(batch['reward'])),
+                    torch.from_numpy(np.ascontiguousarray(batch['next_state'])),
+                    torch.from_numpy(batch['done'].astype(np.float32)),
+                )
+
+    def __iter__(self):
+        """Yields (states, actions, rewards, next_states, dones) tensors for one pass over every shard."""
+        batches = queue.Queue(maxsize=self.prefetch)
+        end = object()
+        errors = []
+        stop = threading.Event()
+
+        def put(item):
+            #waits for room in the queue, but gives up as soon as the consumer has gone away
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches():
+                    if not put(batch):
+                        return
+            except Exception as error:
+                errors.append(error)
+            put(end)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        self.stops.add(stop)
+        thread.start()
+        try:
+            while True:
+                try:
+                    batch = batches.get(timeout=0.1)
+                except queue.Empty:
+                    #close() was called, so the producer won't put anything else
+                    if stop.is_set():
+                        break
+                    continue
+                if batch is end:
+                    break
+                yield batch
+        finally:
+            #runs when the pass finishes and also when the loop breaks out early and the iterator is closed
+            stop.set()
+            thread.join()
+            self.stops.discard(stop)
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        """Stops the background threads of every pass that is still running."""
+        for stop in list(self.stops):
+            stop.set()
@@ -1,17 +1,19 @@
 import torch
 import torch.nn as nn
 import random
+from .game_config import DIRECTION_START, REVERSE_ACTIONS
 
 #the DQN class defines a neural network that akes in the current state of the game as input and outputs a set of Q-values for each of the 4 directions the snake could move in
 #this lets the AI evaluate and choose the best move at each step of the way while playing the game
 class DQN(nn.Module):
-    def __init__(self, input_size, hidden_size, output_size):
+    def __init__(self, input_size, hidden_size, output_size, dueling=False):
         """Initializes the DQN model with the given sizes.
 
         Args:
             input_size (int): The size of the input state vector. The DQN will recieve this many (13) pieces of information about the game.
             hidden_size (int): The size of the hidden layer. The amount of "neurons" (128) that are processing the numbers from the input and outputting new numbers.
             output_size (int): The size of the output vector representing the q values. The DQN will output 4 numbers each representing the directions that the snake can take: up, down, left, right.
+            dueling (bool): If True, the output layer is split into a state value head and an advantage head (dueling architecture).
         """
         
         #set up everything needed for a PyTorch neural network by calling the parent class (nn.Module)
@@ -39,6 +41,13 @@ class DQN(nn.Module):
         #the output of this layer is the Q-values for each possible action
         self.fc3 = nn.Linear(hidden_size, output_size)
 
+        #with the dueling architecture, fc3 becomes the "advantage" head (how much better each direction is than the others)
+        #and this extra layer becomes the "value" head (how good the current state is no matter which direction is taken)
+        #fc3 keeps its name so that load_weights can load a checkpoint from the plain network and only has to set up the value head
+        self.dueling = dueling
+        if dueling:
+            self.value = nn.Linear(hidden_size, 1)
+
     def forward(self, x):
         """Computes the forward pass of the DQN model.
         
@@ -59,27 +68,64 @@ class DQN(nn.Module):
         #processes the output of the first layer through the second layer of the model (with the 128 output neurons described in the hidden_size parameter)
         x = torch.relu(self.fc2(x))
         #processes the output of the second layer through the third layer of the model (with the 4 output neurons described in the output_size parameter) to get the movement values
+        if self.dueling:
+            #combines the value and the advantages into Q-values; the mean advantage is subtracted so the value head can't just be absorbed into the advantages
+            advantages = self.fc3(x)
+            return self.value(x) + advantages - advantages.mean(dim=1, keepdim=True)
         x = self.fc3(x)
         #returns the final 4 numbers describing the movement values
         return x
 
+    def load_weights(self, state_dict):
+        """Loads a saved state dict, including one from the plain network into a dueling network.
+
+        Args:
+            state_dict (dict): The saved weights.
+
+        Raises:
+            ValueError: If the weights are from a dueling network but this network is plain.
+        """
+
+        has_value = 'value.weight' in state_dict
+        if has_value and not self.dueling:
+            raise ValueError("The weights are from a dueling network, but this network was created with dueling=False")
+        if self.dueling and not has_value:
+            #the plain network's fc3 becomes the advantage head, and the value head starts out as the mean of the advantages
+            #that makes value + advantages - mean(advantages) equal to the old fc3 output, so the loaded agent plays exactly the same
+            state_dict = dict(state_dict)
+            state_dict['value.weight'] = state_dict['fc3.weight'].mean(dim=0, keepdim=True)
+            state_dict['value.bias'] = state_dict['fc3.bias'].mean(dim=0, keepdim=True)
+            print('Loaded plain weights into a dueling network, the value head starts at the mean of the advantages')
+        self.load_state_dict(state_dict)
+
+#the game ignores an action that turns the snake around, so that action is never worth exploring or learning about
+#the direction the snake is going is already part of the state, so the illegal action can be found from the state alone
+def legal_actions(state):
+    """Returns the list of legal actions for a state vector."""
+    return [action for action in range(4) if not state[DIRECTION_START + REVERSE_ACTIONS[action]]]
+
+def illegal_action_mask(states):
+    """Returns a bool tensor that is True for the illegal action of every state in a batch of states."""
+    return states[:, DIRECTION_START:DIRECTION_START + 4][:, list(REVERSE_ACTIONS)] > 0.5
+
 #used during gameplay to make the snake move in the best direction, but doesn't change the "brain" of the snake
-def select_action(state, q_network, epsilon):
+def select_action(state, q_network, epsilon, rng=random):
     """Selects an action based on an epsilon-greedy policy.
 
     Args:
         state (list): The state vector.
         q_network (DQN): The DQN model used to compute the q values.
         epsilon (float): The probability of taking a random action.
+        rng (random.Random): The generator the random actions come from. Defaults to the random module.
 
     Returns:
         int: The action to take.
     """
     
     #the epsilon variable holds the percent chance that it will take for the snake to take a random action out of the 4 directions it could move
-    if random.random() < epsilon:
-        #4 options for the snake to move in so there are 4 options for the random number to be
-        return random.randint(0, 3)
+    if rng.random() < epsilon:
+        #there are 3 legal options for the snake to move in, since turning around is ignored by the game
+        return rng.choice(legal_actions(state))
     else:
         #if the random chance doesn't happen, then the snake will use its "brain" to make an actually smart decision
         #this converts the game state (simply a list of numbers) into a PyTorch tensor as a 32-bit floating point number
@@ -89,13 +135,15 @@ def select_action(state, q_network, epsilon):
         with torch.no_grad():
             #this runs the game state through the neural network to get the Q-values for each of the 4 directions
             q_values = q_network(state)
+            #the illegal action gets a Q-value of minus infinity so it is never picked
+            q_values = q_values.masked_fill(illegal_action_mask(state.unsqueeze(0)), float('-inf'))
         #this returns the index of the direction with the highest Q-value; this will make the snake go in the best direction with the data aquired from the neural network
         return torch.argmax(q_values).item()
 
 #this one is like the select_action function but it is used to update the "brain" of the snake with the gradients being actually used here to do so
 #used in the pretrain.py file to update the "brain" of the snake in training to make it better at moving towards the fruits
 #one of the parameters is the memory, which is the ReplayMemory class from the memory.py file which is a memory buffer that can store and manage the past game experiences of the AI, so that it can learn from them later
-def update_network(q_network, target_network, optimizer, memory):
+def update_network(q_network, target_network, optimizer, memory, batch_size=128, double=False, warmup=None, augment=False):
     """
     Updates the Q-network using a batch of experiences from replay memory.
 
@@ -108,49 +156,98 @@ def update_network(q_network, target_network, optimizer, memory):
         target_network (DQN): The target Q-network used to compute the target Q-values.
         optimizer (torch.optim.Optimizer): The optimizer used to update the Q-network.
         memory (ReplayMemory): The replay memory containing past experiences.
+        batch_size (int): The number of experiences to learn from in one update.
+        double (bool): If True, uses Double DQN targets instead of the vanilla max over the target network.
+        warmup (int): The number of experiences needed in the memory before learning starts. Defaults to batch_size.
+        augment (bool): If True, the batch is randomly flipped horizontally and vertically, since the board is symmetric.
 
     Returns:
         None
     """
 
-    #if the memory is less than 128, then the function will return nothing and not do anything
+    #if the memory has less than the warmup amount (128 by default), then the function will return nothing and not do anything
     #it does that because it wouldn't have enough data to train the model effectively with, so few memories
     #before gaining enough memories the snake will just move randomly to gain memories and know what is working and helping and what doesn't
-    if len(memory) < 128:
+    if warmup is None:
+        warmup = batch_size
+    if len(memory) < max(warmup, batch_size):
         return
 
-    #take 128 tandom samples from experiences in the memory
-    batch = memory.sample(128)
+    #take batch_size (128 by default) random samples from experiences in the memory
+    #they come back as 6 separate arrays: states, actions, rewards, next_states, dones and discounts
+    states, actions, rewards, next_states, dones, discounts = memory.sample_batch(batch_size, augment)
 
-    #separates each experience into 5 separate lists: states, actions, rewards, next_states, and dones
-    states, actions, rewards, next_states, dones = zip(*batch)
+    #converts the 5 separate arrays from the experiences into PyTorch tensors to be used for efficient computing
+    #the actions have whole numbers so they are long integers instead of floats like the other tensors
+    states = torch.from_numpy(states)
+    actions = torch.from_numpy(actions)
+    rewards = torch.from_numpy(rewards)
+    next_states = torch.from_numpy(next_states)
+    dones = torch.from_numpy(dones)
 
-    #converts the 5 separate lists from the experiences into PyTorch tensors to be used for efficient computing
-    states = torch.tensor(states, dtype=torch.float32)
-    actions = torch.tensor(actions, dtype=torch.long) #has whole numbers so it is a long integer instead of a float like the other tensors
-    rewards = torch.tensor(rewards, dtype=torch.float32)
-    next_states = torch.tensor(next_states, dtype=torch.float32)
-    dones = torch.tensor(dones, dtype=torch.float32)
+    #the memory stores n-step returns, so the bootstrapped Q-value is n steps in the future and has to be discounted n times
+    #each experience has its own discount since the ones left at the end of a cut off episode cover fewer than n steps
+    #the discounts come from the memory itself so they always match the gamma its rewards were summed with
+    discounts = torch.from_numpy(discounts)
+    learn_from_batch(q_network, target_network, optimizer, states, actions, rewards, next_states, dones, discounts, double)
 
-    #q_network(states) -> runs all 128 states through the network (128 sets of 4 Q-values/possible actions); actions.unsqueeze(1) -> adds a dimension to the actions tensor to match the dimensions of the q_values tensor
-    #.gather(1, actions.unsqueeze(1)) -> for each experience, it selects the Q-values of the action that was taken; .squeeze(1) -> removes the extra dimension added to the actions tensor
-    #all together -> for each experience, it selects the Q-values of the action that was taken
-    #if experience 0 took action 2 (left), and Q-values were [1.2, -0.3, 2.8, 0.9] -> we extract 2.8 (the Q-value for action 2)
-    q_values = q_network(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+#does the actual learning for update_network once the batch has been turned into tensors
+#it is split out so that batches which don't come from a ReplayMemory can be learned from the same way
+def learn_from_batch(q_network, target_network, optimizer, states, actions, rewards, next_states, dones, discount=0.99, double=False):
+    """
+    Performs one gradient descent step on a batch of experiences.
 
-    #next_states -> the next state of the snake after the action was taken (where the snake ended up after each action)
-    #.max(1)[0] -> finds the maximum Q-value for each of the 128 next states (the best possible Q-value for each of the 128 next states)
-    #target_network(next_states) -> runs all 128 next states through the target network (128 sets of 4 Q-values/possible actions) which is more stable than the main network
-    #the main network is the network that we're actually training and updating
-    #the target network is a stable copy of the main network used to compute targets for learning which is updated less frequently (used for finding what the Q-values "should" be)
-    next_q_values = target_network(next_states).max(1)[0]
+    Args:
+        q_network (DQN): The Q-network being trained.
+        target_network (DQN): The target Q-network used to compute the target Q-values.
+        optimizer (torch.optim.Optimizer): The optimizer used to update the Q-network.
+        states (torch.tensor): The batch of states.
+        actions (torch.tensor): The batch of actions that were taken (long).
+        rewards (torch.tensor): The batch of (possibly n-step) rewards.
+        next_states (torch.tensor): The batch of states the bootstrapped Q-values are taken from.
+        dones (torch.tensor): The batch of done flags (1.0 if the game ended).
+        discount (float or torch.tensor): The discount applied to the bootstrapped Q-values (gamma ** n_step),
+            or one discount per experience.
+        double (bool): If True, uses Double DQN targets.
+
+    Returns:
+        float: The loss of the batch.
+    """
+
+    batch_size = states.shape[0]
+    #the illegal action of each next state can't be taken, so it is left out of the best next Q-value
+    next_illegal = illegal_action_mask(next_states)
+
+    if double:
+        #Double DQN picks the best next action with the main network but takes its value from the target network
+        #this stops the max from always picking the Q-values that happen to be overestimated, which makes learning faster and more stable
+        #the states and next_states are run through the main network together as one big batch so it only takes a single forward pass
+        all_q_values = q_network(torch.cat((states, next_states)))
+        q_values = all_q_values[:batch_size].gather(1, actions.unsqueeze(1)).squeeze(1)
+        next_actions = all_q_values[batch_size:].detach().masked_fill(next_illegal, float('-inf')).argmax(1, keepdim=True)
+        with torch.no_grad():
+            next_q_values = target_network(next_states).gather(1, next_actions).squeeze(1)
+    else:
+        #q_network(states) -> runs all 128 states through the network (128 sets of 4 Q-values/possible actions); actions.unsqueeze(1) -> adds a dimension to the actions tensor to match the dimensions of the q_values tensor
+        #.gather(1, actions.unsqueeze(1)) -> for each experience, it selects the Q-values of the action that was taken; .squeeze(1) -> removes the extra dimension added to the actions tensor
+        #all together -> for each experience, it selects the Q-values of the action that was taken
+        #if experience 0 took action 2 (left), and Q-values were [1.2, -0.3, 2.8, 0.9] -> we extract 2.8 (the Q-value for action 2)
+        q_values = q_network(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+
+        #next_states -> the next state of the snake after the action was taken (where the snake ended up after each action)
+        #.max(1)[0] -> finds the maximum Q-value for each of the 128 next states (the best possible Q-value for each of the 128 next states)
+        #target_network(next_states) -> runs all 128 next states through the target network (128 sets of 4 Q-values/possible actions) which is more stable than the main network
+        #the main network is the network that we're actually training and updating
+        #the target network is a stable copy of the main network used to compute targets for learning which is updated less frequently (used for finding what the Q-values "should" be)
+        with torch.no_grad():
+            next_q_values = target_network(next_states).masked_fill(next_illegal, float('-inf')).max(1)[0]
 
     #rewards -> the reward for the action that was just taken
-    #0.99 -> the discount factor which is how much we value future rewards compared to immediate rewards
+    #discount -> the discount factor (0.99 by default) which is how much we value future rewards compared to immediate rewards
     #next_q_values -> the best possible Q-value for each of the 128 next states
     #dones -> a list of boolean values that tells us whether each game ended after taking the action
     #this is the Bellman equation which calulates what the Q-values "should" be
-    targets = rewards + 0.99 * next_q_values * (1 - dones)
+    targets = rewards + discount * next_q_values * (1 - dones)
 
     #this uses the MSE (Mean Squared Error) equation to calculate the loss between the predicted Q-values and the target Q-values
     #equation: loss = 1/n * sum((predicted - target)^2)
@@ -176,4 +273,30 @@ def update_network(q_network, target_network, optimizer, memory):
     #this is the function that actually updates the network weights using the computed gradients
     #it takes the current weights and adjusts them by the amount specified by the gradients
     #equation: new weights = old weights - learning rate * gradients
-    optimizer.step()
\ No newline at end of file
+    optimizer.step()
+
+    return loss.item()
+
+#used to warm start the "brain" of the snake by copying the moves of a scripted player before it plays on its own
+#the Q-values are treated like scores for each direction, and the network learns to give the demonstrated direction the highest score
+def behavior_cloning_step(q_network, optimizer, states, actions):
+    """
+    Performs one gradient descent step of behavior cloning on a batch of demonstrations.
+
+    Args:
+        q_network (DQN): The Q-network being trained.
+        optimizer (torch.optim.Optimizer): The optimizer used to update the Q-network.
+        states (torch.tensor): The batch of states.
+        actions (torch.tensor): The batch of demonstrated actions (long).
+
+    Returns:
+        float: The loss of the batch.
+    """
+
+    #cross entropy loss is low when the demonstrated action has the highest output compared to the others
+    loss = nn.functional.cross_entropy(q_network(states), actions)
+    optimizer.zero_grad()
+    loss.backward()
+    torch.nn.utils.clip_grad_norm_(q_network.parameters(), max_norm=1.0)
+    optimizer.step()
+    return loss.item()
@@ -0,0 +1,204 @@
+"""
+Gymnasium and PettingZoo wrappers around SnakeGame for standard RL tooling.
+
+SnakeParallelEnv exposes every snake through the PettingZoo parallel API, and
+SnakeGymEnv exposes snake 1 through the Gymnasium API with the other snakes
+driven by a fixed opponent policy. SnakeGymEnv is registered as 'SnakeVsSnake-v0' so it
+can be vectorized with make_vector_env. The legal actions of every step are
+given as an 'action_mask' (1 is legal) in the infos. Both can be given an
+EpisodeScheduler to truncate stalled games early, and the reason an episode
+was truncated is given as 'truncation' in the infos.
+
+Every env has its own random.Random for the game, and the opponent policies
+draw their random moves from it too (as game_state.rng), so a seeded reset
+gives the same episode no matter what the random module is doing.
+"""
+
+import copy
+import random
+import numpy as np
+import gymnasium
+from gymnasium import spaces
+from pettingzoo import ParallelEnv
+
+from .snake import SnakeGame
+from .dqn import select_action, legal_actions
+from .scripted import POLICIES
+from .scheduler import EpisodeScheduler
+from .game_config import FPS
+
+#the 13 state values are normalized positions/distances and 0/1 flags, but a head can end up one cell off the board when a snake dies
+OBSERVATION_SPACE = spaces.Box(low=-0.1, high=1.1, shape=(13,), dtype=np.float32)
+#0 is right, 1 is left, 2 is up, and 3 is down
+ACTION_SPACE = spaces.Discrete(4)
+
+
+def random_opponent(game_state, snake_num):
+    """An opponent policy that moves in a random (legal) direction every step."""
+    return game_state.rng.choice(legal_actions(game_state.get_state(snake_num)))
+
+
+class DQNOpponent:
+    """An opponent policy that plays with a DQN, picking random actions with probability epsilon."""
+
+    def __init__(self, q_network, epsilon=0.0):
+        self.q_network = q_network
+        self.epsilon = epsilon
+
+    def __call__(self, game_state, snake_num):
+        return select_action(game_state.get_state(snake_num), self.q_network, self.epsilon, game_state.rng)
+
+
+class SnakeParallelEnv(ParallelEnv):
+    """PettingZoo parallel environment where every snake is an agent (named snake_1 to snake_K)."""
+
+    metadata = {'name': 'snake_vs_snake_v0', 'render_modes': ['human'], 'render_fps': FPS}
+
+    def __init__(self, max_steps=500, render_mode=None, num_snakes=2, scheduler=None):
+        self.max_steps = max_steps
+        #without a scheduler, episodes are only truncated at max_steps
+        self.scheduler = scheduler if scheduler is not None else EpisodeScheduler(max_steps)
+        self.render_mode = render_mode
+        self.possible_agents = [f'snake_{i}' for i in range(1, num_snakes + 1)]
+        self.agents = []
+        #the game gets its own generator so seeding an env never touches the random module the trainer uses
+        self.rng = random.Random()
+        self.game = SnakeGame(render=render_mode == 'human', num_snakes=num_snakes, rng=self.rng)
+
+    def observation_space(self, agent):
+        return OBSERVATION_SPACE
+
+    def action_space(self, agent):
+        return ACTION_SPACE
+
+    def _observe(self, snake_num):
+        return np.asarray(self.game.get_state(snake_num), dtype=np.float32)
+
+    def _action_mask(self, snake_num):
+        return np.asarray(self.game.get_action_mask(snake_num), dtype=np.int8)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.game.reset()
+        self.agents = list(self.possible_agents)
+        self.scheduler.reset(self.game.game_state)
+        observations = {agent: self._observe(i) for i, agent in enumerate(self.possible_agents, start=1)}
+        infos = {agent: {'action_mask': self._action_mask(i)} for i, agent in enumerate(self.possible_agents, start=1)}
+        return observations, infos
+
+    def step(self, actions):
+        results = self.game.step(*(int(actions[agent]) for agent in self.possible_agents))
+        terminated = any(done for _, _, done in results)
+        truncation = None if terminated else self.scheduler.step(self.game.game_state)
+        truncated = truncation is not None
+
+        observations, rewards, terminations, truncations, infos = {}, {}, {}, {}, {}
+        for i, (agent, (state, reward, done)) in enumerate(zip(self.possible_agents, results), start=1):
+            observations[agent] = np.asarray(state, dtype=np.float32)
+            rewards[agent] = reward
+            terminations[agent] = done
+            truncations[agent] = truncated
+            infos[agent] = {'score': self.game.scores[i - 1], 'action_mask': self._action_mask(i), 'truncation': truncation}
+
+        #every snake leaves together since the game ends for all of them as soon as one dies
+        if terminated or truncated:
+            self.agents = []
+        return observations, rewards, terminations, truncations, infos
+
+    def render(self):
+        #with render_mode 'human' the game already draws itself every step, so this only redraws the current frame
+        if self.render_mode == 'human':
+            self.game.renderer.draw(self.game.game_state)
+
+    def close(self):
+        pass
+
+
+class SnakeGymEnv(gymnasium.Env):
+    """Gymnasium environment where the agent controls snake 1 against a fixed opponent policy."""
+
+    metadata = {'render_modes': ['human'], 'render_fps': FPS}
+
+    def __init__(self, opponent=None, max_steps=500, render_mode=None, num_snakes=2, scheduler=None):
+        """
+        Args:
+            opponent (callable or str): The policy for every other snake, called as
+                opponent(game_state, snake_num) and returning an action, or the name of a
+                scripted policy ('greedy', 'bfs' or 'astar'). Defaults to random_opponent.
+            max_steps (int): The number of steps before an episode is truncated.
+            render_mode (str): 'human' to draw the game with pygame, otherwise None.
+            num_snakes (int): The number of snakes in the game, including the agent's.
+            scheduler (EpisodeScheduler): Decides when episodes are truncated. Defaults to
+                EpisodeScheduler(max_steps), which only truncates at max_steps.
+        """
+        self.observation_space = OBSERVATION_SPACE
+        self.action_space = ACTION_SPACE
+        if opponent is None:
+            opponent = random_opponent
+        elif isinstance(opponent, str):
+            opponent = POLICIES[opponent]
+        self.opponent = opponent
+        self.max_steps = max_steps
+        self.scheduler = scheduler if scheduler is not None else EpisodeScheduler(max_steps)
+        self.render_mode = render_mode
+        self.rng = random.Random()
+        self.game = SnakeGame(render=render_mode == 'human', num_snakes=num_snakes, rng=self.rng)
+
+    def _action_mask(self):
+        return np.asarray(self.game.get_action_mask(1), dtype=np.int8)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        #the game's generator is seeded from np_random, so a seeded env places the same apples without touching the random module
+        self.rng.seed(int(self.np_random.integers(2**63)))
+        self.game.reset()
+        self.scheduler.reset(self.game.game_state)
+        return np.asarray(self.game.get_state(1), dtype=np.float32), {'action_mask': self._action_mask()}
+
+    def step(self, action):
+        opponent_actions = [self.opponent(self.game.game_state, snake_num) for snake_num in range(2, self.game.num_snakes + 1)]
+        results = self.game.step(int(action), *opponent_actions)
+        state1, reward1, _ = results[0]
+        terminated = any(done for _, _, done in results)
+        truncation = None if terminated else self.scheduler.step(self.game.game_state)
+        truncated = truncation is not None
+        #with more than one opponent this is the best of their scores
+        opponent_score = max(self.game.scores[1:], default=0)
+        info = {'score': self.game.score1, 'opponent_score': opponent_score, 'action_mask': self._action_mask(), 'truncation': truncation}
+        return np.asarray(state1, dtype=np.float32), reward1, terminated, truncated, info
+
+    def render(self):
+        if self.render_mode == 'human':
+            self.game.renderer.draw(self.game.game_state)
+
+
+gymnasium.register(id='SnakeVsSnake-v0', entry_point='src.envs:SnakeGymEnv')
+
+
+def make_vector_env(num_envs, asynchronous=True, **kwargs):
+    """
+    Creates num_envs copies of SnakeVsSnake-v0 as one vector environment.
+
+    With asynchronous, every copy runs in its own subprocess and the
+    observations are passed back through shared memory.
+
+    Args:
+        num_envs (int): The number of environment copies.
+        asynchronous (bool): If True, uses AsyncVectorEnv, otherwise SyncVectorEnv.
+        **kwargs: Passed on to SnakeGymEnv (opponent, max_steps, render_mode, num_snakes, scheduler).
+            A scheduler is copied for every environment, since it tracks the episode it is used in.
+
+    Returns:
+        gymnasium.vector.VectorEnv: The vector environment.
+    """
+    def make_env():
+        env_kwargs = dict(kwargs)
+        if env_kwargs.get('scheduler') is not None:
+            env_kwargs['scheduler'] = copy.deepcopy(env_kwargs['scheduler'])
+        return gymnasium.make('SnakeVsSnake-v0', **env_kwargs)
+
+    env_fns = [make_env] * num_envs
+    if asynchronous:
+        return gymnasium.vector.AsyncVectorEnv(env_fns, shared_memory=True)
+    return gymnasium.vector.SyncVectorEnv(env_fns)
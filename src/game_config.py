@@ -13,14 +13,31 @@ SNAKE1_COLOR = (0, 255, 0)      # Green
 SNAKE2_COLOR = (0, 128, 255)    # Blue
 APPLE_COLOR = (255, 0, 0)       # Red
 BACKGROUND_COLOR = (0, 0, 0)    # Black
+SNAKE3_COLOR = (255, 255, 0)    # Yellow
+SNAKE4_COLOR = (255, 0, 255)    # Magenta
 
 # Initial positions
 SNAKE1_START_POS = (100, 100)
 SNAKE2_START_POS = (700, 500)
+SNAKE3_START_POS = (700, 100)
+SNAKE4_START_POS = (100, 500)
 
 # Initial directions
 SNAKE1_START_DIRECTION = 'right'
 SNAKE2_START_DIRECTION = 'left'
+SNAKE3_START_DIRECTION = 'left'
+SNAKE4_START_DIRECTION = 'right'
+
+# Per-snake settings, indexed by snake id (snake number - 1); the number of
+# entries is the most snakes a game can have
+SNAKE_COLORS = [SNAKE1_COLOR, SNAKE2_COLOR, SNAKE3_COLOR, SNAKE4_COLOR]
+SNAKE_START_POSITIONS = [SNAKE1_START_POS, SNAKE2_START_POS, SNAKE3_START_POS, SNAKE4_START_POS]
+SNAKE_START_DIRECTIONS = [SNAKE1_START_DIRECTION, SNAKE2_START_DIRECTION, SNAKE3_START_DIRECTION, SNAKE4_START_DIRECTION]
+MAX_SNAKES = len(SNAKE_START_POSITIONS)
+
+# Grid dimensions in cells
+GRID_COLS = SCREEN_WIDTH // GRID_SIZE
+GRID_ROWS = SCREEN_HEIGHT // GRID_SIZE
 
 # Reward values
 REWARD_STEP = -0.01
@@ -32,4 +49,12 @@ REWARD_WIN = 0.3
 REWARD_DEATH = -1.0
 
 # State normalization
-DISTANCE_NORMALIZATION = 1000.0 
\ No newline at end of file
+DISTANCE_NORMALIZATION = 1000.0
+
+# State layout: the direction one-hot (right, left, up, down) starts at this index,
+# in the same order as the actions
+DIRECTION_START = 5
+
+# Turning around is ignored by the game, so the action opposite to the current
+# direction is never legal (right <-> left, up <-> down)
+REVERSE_ACTIONS = (1, 0, 3, 2)
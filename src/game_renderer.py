@@ -14,7 +14,7 @@ class GameRenderer:
         if self.render:
             pygame.init()
             self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-            pygame.display.set_caption('AI Snake - Two Player')
+            pygame.display.set_caption('AI Snake - Multiplayer')
             self.clock = pygame.time.Clock()
             self.font = pygame.font.Font(None, 36)
     
@@ -27,25 +27,20 @@ class GameRenderer:
         
         self.screen.fill(BACKGROUND_COLOR)
         
-        # Snake 1: Green
-        for segment in game_state.snake1_pos:
-            pygame.draw.rect(self.screen, SNAKE1_COLOR, 
-                           pygame.Rect(segment[0], segment[1], GRID_SIZE, GRID_SIZE))
-        
-        # Snake 2: Blue
-        for segment in game_state.snake2_pos:
-            pygame.draw.rect(self.screen, SNAKE2_COLOR, 
-                           pygame.Rect(segment[0], segment[1], GRID_SIZE, GRID_SIZE))
+        # Snakes: green, blue, yellow, magenta
+        for body, color in zip(game_state.snakes, SNAKE_COLORS):
+            for segment in body:
+                pygame.draw.rect(self.screen, color, 
+                               pygame.Rect(segment[0], segment[1], GRID_SIZE, GRID_SIZE))
         
         # Apple: Red
         pygame.draw.rect(self.screen, APPLE_COLOR, 
                         pygame.Rect(game_state.apple_pos[0], game_state.apple_pos[1], GRID_SIZE, GRID_SIZE))
         
-        # Scores
-        score1_text = self.font.render(f'P1 Score: {game_state.score1}', True, SNAKE1_COLOR)
-        score2_text = self.font.render(f'P2 Score: {game_state.score2}', True, SNAKE2_COLOR)
-        self.screen.blit(score1_text, (10, 10))
-        self.screen.blit(score2_text, (650, 10))
+        # Scores: odd players on the left, even players on the right
+        for i, (score, color) in enumerate(zip(game_state.scores, SNAKE_COLORS)):
+            score_text = self.font.render(f'P{i + 1} Score: {score}', True, color)
+            self.screen.blit(score_text, (10 if i % 2 == 0 else 650, 10 + 30 * (i // 2)))
         
         pygame.display.flip()
     
@@ -7,70 +7,107 @@ import random
 from .game_config import *
 
 
+def to_cell(pos):
+    """Returns the index of the grid cell at pos, the same index the occupancy grid uses."""
+    return (pos[1] // GRID_SIZE) * GRID_COLS + pos[0] // GRID_SIZE
+
+
 class GameState:
-    """Manages the current state of the game."""
-    
-    def __init__(self):
-        self.snake1_pos = [SNAKE1_START_POS]
-        self.snake2_pos = [SNAKE2_START_POS]
-        self.apple_pos = self._get_random_grid_position(exclude=self.snake1_pos + self.snake2_pos)
-        self.direction1 = SNAKE1_START_DIRECTION
-        self.direction2 = SNAKE2_START_DIRECTION
-        self.score1 = 0
-        self.score2 = 0
-        self.done1 = False
-        self.done2 = False
-    
+    """
+    Manages the current state of the game.
+
+    The snakes are stored in lists indexed by snake id (snake number - 1), and
+    every body segment that is on the board is counted in a shared occupancy
+    grid so collision and danger checks don't have to search the bodies.
+    """
+
+    def __init__(self, num_snakes=2, rng=None):
+        """
+        Args:
+            num_snakes (int): The number of snakes.
+            rng (random.Random): The generator the apples are placed with. Defaults to the
+                random module, so seeding random makes the game reproducible.
+        """
+        self.rng = rng if rng is not None else random
+        if not 1 <= num_snakes <= MAX_SNAKES:
+            raise ValueError(f"num_snakes must be between 1 and {MAX_SNAKES}, got {num_snakes}")
+        self.num_snakes = num_snakes
+        self.scores = [0] * num_snakes
+        self.reset()
+
     def _get_random_grid_position(self, exclude=None):
         """
-        Returns a random grid position within the screen boundaries that is not 
-        currently occupied by the snake. The position is calculated based on the 
+        Returns a random grid position within the screen boundaries that is not
+        currently occupied by the snake. The position is calculated based on the
         grid size, ensuring that the coordinates are aligned with the grid.
+
+        Without exclude, every cell in the occupancy grid is avoided.
         """
-        if exclude is None:
-            exclude = []
         while True:
-            grid_x = random.randint(0, (SCREEN_WIDTH // GRID_SIZE) - 1) * GRID_SIZE
-            grid_y = random.randint(0, (SCREEN_HEIGHT // GRID_SIZE) - 1) * GRID_SIZE
-            if (grid_x, grid_y) not in exclude:
+            grid_x = self.rng.randint(0, GRID_COLS - 1) * GRID_SIZE
+            grid_y = self.rng.randint(0, GRID_ROWS - 1) * GRID_SIZE
+            if exclude is None:
+                if not self.is_occupied((grid_x, grid_y)):
+                    return (grid_x, grid_y)
+            elif (grid_x, grid_y) not in exclude:
                 return (grid_x, grid_y)
-    
+
     def reset(self):
-        """Resets the game state to initial conditions."""
-        self.snake1_pos = [SNAKE1_START_POS]
-        self.snake2_pos = [SNAKE2_START_POS]
-        self.apple_pos = self._get_random_grid_position(exclude=self.snake1_pos + self.snake2_pos)
-        self.direction1 = SNAKE1_START_DIRECTION
-        self.direction2 = SNAKE2_START_DIRECTION
-        self.score1 = getattr(self, 'score1', 0)
-        self.score2 = getattr(self, 'score2', 0)
-        self.done1 = False
-        self.done2 = False
-    
+        """Resets the game state to initial conditions (the scores are kept)."""
+        self.snakes = [[SNAKE_START_POSITIONS[i]] for i in range(self.num_snakes)]
+        self.directions = [SNAKE_START_DIRECTIONS[i] for i in range(self.num_snakes)]
+        self.dones = [False] * self.num_snakes
+        self._rebuild_occupancy()
+        self.apple_pos = self._get_random_grid_position()
+
+    def _rebuild_occupancy(self):
+        self.occupancy = bytearray(GRID_COLS * GRID_ROWS)
+        for body in self.snakes:
+            for pos in body:
+                self.occupy(pos)
+
+    # These run several times per snake every step, so the bounds check and
+    # cell index are written out instead of calling to_cell
+
+    def occupy(self, pos):
+        """Counts a body segment at pos in the occupancy grid (segments off the board aren't counted)."""
+        x, y = pos
+        if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT:
+            self.occupancy[(y // GRID_SIZE) * GRID_COLS + x // GRID_SIZE] += 1
+
+    def vacate(self, pos):
+        """Removes a body segment at pos from the occupancy grid."""
+        x, y = pos
+        if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT:
+            self.occupancy[(y // GRID_SIZE) * GRID_COLS + x // GRID_SIZE] -= 1
+
+    def occupant_count(self, pos):
+        """Returns how many body segments are at pos (0 for positions off the board)."""
+        x, y = pos
+        if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT:
+            return self.occupancy[(y // GRID_SIZE) * GRID_COLS + x // GRID_SIZE]
+        return 0
+
+    def is_occupied(self, pos):
+        """Returns whether any snake has a body segment at pos."""
+        return self.occupant_count(pos) > 0
+
     def get_state(self, snake_num):
         """
         Returns the current state of the game as a list of integers determining what each thing is doing
 
         Returns:
-            list: a list containing the snake's head position (x, y), apple 
+            list: a list containing the snake's head position (x, y), apple
             position (x, y), direction vector, and the danger indicators.
         """
-        if snake_num == 1:
-            head_x, head_y = self.snake1_pos[0]
-            snake_pos = self.snake1_pos
-            other_snake = self.snake2_pos
-            direction = self.direction1
-        else:
-            head_x, head_y = self.snake2_pos[0]
-            snake_pos = self.snake2_pos
-            other_snake = self.snake1_pos
-            direction = self.direction2
-        
+        head_x, head_y = self.snakes[snake_num - 1][0]
+        direction = self.directions[snake_num - 1]
+
         apple_x, apple_y = self.apple_pos
-        
+
         #calculates the distance to the apple
         distance_to_apple = math.sqrt((head_x - apple_x)**2 + (head_y - apple_y)**2)
-        
+
         #the direction vector
         direction_vec = [0, 0, 0, 0]
         if direction == 'right':
@@ -81,23 +118,97 @@ class GameState:
             direction_vec[2] = 1
         elif direction == 'down':
             direction_vec[3] = 1
-        
-        #danger indicators
-        danger_up = int((head_x, head_y - GRID_SIZE) in snake_pos or (head_x, head_y - GRID_SIZE) in other_snake or head_y - GRID_SIZE < 0)
-        danger_down = int((head_x, head_y + GRID_SIZE) in snake_pos or (head_x, head_y + GRID_SIZE) in other_snake or head_y + GRID_SIZE >= SCREEN_HEIGHT)
-        danger_left = int((head_x - GRID_SIZE, head_y) in snake_pos or (head_x - GRID_SIZE, head_y) in other_snake or head_x - GRID_SIZE < 0)
-        danger_right = int((head_x + GRID_SIZE, head_y) in snake_pos or (head_x + GRID_SIZE, head_y) in other_snake or head_x + GRID_SIZE >= SCREEN_WIDTH)
-        
+
+        #danger indicators (any snake's body, including this one's, or a wall)
+        occupant_count = self.occupant_count
+        danger_up = int(head_y - GRID_SIZE < 0 or occupant_count((head_x, head_y - GRID_SIZE)) > 0)
+        danger_down = int(head_y + GRID_SIZE >= SCREEN_HEIGHT or occupant_count((head_x, head_y + GRID_SIZE)) > 0)
+        danger_left = int(head_x - GRID_SIZE < 0 or occupant_count((head_x - GRID_SIZE, head_y)) > 0)
+        danger_right = int(head_x + GRID_SIZE >= SCREEN_WIDTH or occupant_count((head_x + GRID_SIZE, head_y)) > 0)
+
         #normalizing positions by the size of the screen
         head_x_norm = head_x / SCREEN_WIDTH
         head_y_norm = head_y / SCREEN_HEIGHT
         apple_x_norm = apple_x / SCREEN_WIDTH
         apple_y_norm = apple_y / SCREEN_HEIGHT
         distance_norm = distance_to_apple / DISTANCE_NORMALIZATION
-        
+
         state = [
             head_x_norm, head_y_norm, apple_x_norm, apple_y_norm, distance_norm,
             direction_vec[0], direction_vec[1], direction_vec[2], direction_vec[3],
             danger_up, danger_down, danger_left, danger_right
         ]
-        return state 
\ No newline at end of file
+        return state
+
+    def get_action_mask(self, snake_num):
+        """
+        Returns which actions are legal for the given snake as a list of 4 ints (1 is legal).
+
+        The only illegal action is turning around, which the game ignores.
+        """
+        direction = self.directions[snake_num - 1]
+        mask = [1, 1, 1, 1]
+        mask[REVERSE_ACTIONS[('right', 'left', 'up', 'down').index(direction)]] = 0
+        return mask
+
+    # Two-snake accessors, kept for code written before the game supported more snakes
+    # The bodies come back as tuples, since changing a body in place would leave the occupancy
+    # grid out of date; assigning a new body rebuilds the grid
+
+    @property
+    def snake1_pos(self):
+        return tuple(self.snakes[0])
+
+    @snake1_pos.setter
+    def snake1_pos(self, positions):
+        self.snakes[0] = list(positions)
+        self._rebuild_occupancy()
+
+    @property
+    def snake2_pos(self):
+        return tuple(self.snakes[1])
+
+    @snake2_pos.setter
+    def snake2_pos(self, positions):
+        self.snakes[1] = list(positions)
+        self._rebuild_occupancy()
+
+    @property
+    def direction1(self):
+        return self.directions[0]
+
+    @direction1.setter
+    def direction1(self, direction):
+        self.directions[0] = direction
+
+    @property
+    def direction2(self):
+        return self.directions[1]
+
+    @direction2.setter
+    def direction2(self, direction):
+        self.directions[1] = direction
+
+    @property
+    def score1(self):
+        return self.scores[0]
+
+    @score1.setter
+    def score1(self, score):
+        self.scores[0] = score
+
+    @property
+    def score2(self):
+        return self.scores[1]
+
+    @score2.setter
+    def score2(self, score):
+        self.scores[1] = score
+
+    @property
+    def done1(self):
+        return self.dones[0]
+
+    @property
+    def done2(self):
+        return self.dones[1]
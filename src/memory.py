@@ -1,16 +1,58 @@
 import random
 from collections import deque
 import pickle
+import numpy as np
+from .game_config import DIRECTION_START, REVERSE_ACTIONS, SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE
+
+#the board looks the same when it is flipped left to right or top to bottom, so a flipped experience is just as real as the original
+#these are the column orders of a state vector after each flip (head/apple positions, distance, direction right/left/up/down, danger up/down/left/right)
+#and the action each action becomes after the flip (0 is right, 1 is left, 2 is up, and 3 is down)
+HORIZONTAL_FLIP_COLUMNS = np.array([0, 1, 2, 3, 4, 6, 5, 7, 8, 9, 10, 12, 11])
+HORIZONTAL_FLIP_ACTIONS = np.array([1, 0, 2, 3])
+VERTICAL_FLIP_COLUMNS = np.array([0, 1, 2, 3, 4, 5, 6, 8, 7, 10, 9, 11, 12])
+VERTICAL_FLIP_ACTIONS = np.array([0, 1, 3, 2])
+#a position x becomes (SCREEN_WIDTH - GRID_SIZE) - x when flipped, so its normalized value x / SCREEN_WIDTH becomes this minus itself
+HORIZONTAL_FLIP_OFFSET = (SCREEN_WIDTH - GRID_SIZE) / SCREEN_WIDTH
+VERTICAL_FLIP_OFFSET = (SCREEN_HEIGHT - GRID_SIZE) / SCREEN_HEIGHT
+
+def augment_batch(states, actions, next_states):
+    """Randomly flips every experience of a batch horizontally and/or vertically (in place).
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The (batch_size, 13) float32 states.
+    actions : numpy.ndarray
+        The (batch_size,) int64 actions.
+    next_states : numpy.ndarray
+        The (batch_size, 13) float32 next states.
+    """
+
+    #each experience is flipped horizontally half the time and vertically half the time, giving 4 versions of every experience
+    batch_size = len(actions)
+    for flip, columns, flipped_actions, x_or_y, offset in (
+        (np.random.random(batch_size) < 0.5, HORIZONTAL_FLIP_COLUMNS, HORIZONTAL_FLIP_ACTIONS, [0, 2], HORIZONTAL_FLIP_OFFSET),
+        (np.random.random(batch_size) < 0.5, VERTICAL_FLIP_COLUMNS, VERTICAL_FLIP_ACTIONS, [1, 3], VERTICAL_FLIP_OFFSET),
+    ):
+        for batch in (states, next_states):
+            flipped = batch[flip][:, columns]
+            flipped[:, x_or_y] = offset - flipped[:, x_or_y]
+            batch[flip] = flipped
+        actions[flip] = flipped_actions[actions[flip]]
 
 #this class is a container that stores and manages the past game experiences of the AI, so that it can learn from them later
 class ReplayMemory:
-    def __init__(self, capacity):
+    def __init__(self, capacity, n_step=1, gamma=0.99):
         """Initializes the ReplayMemory object with a given capacity.
 
         Parameters
         ----------
         capacity : int
             The maximum size of the memory buffer.
+        n_step : int
+            The number of steps the stored rewards are summed over (1 stores plain transitions).
+        gamma : float
+            The discount factor used to sum the n-step rewards.
         """
         
         #declaring a new public variable called memory in the ReplayMemory class
@@ -18,6 +60,11 @@ class ReplayMemory:
         #creates a new deque object with the maximum size being capacity; this is a memory buffer that can store a limited number of experiences
         self.memory = deque(maxlen=capacity)
 
+        #with n-step returns, the last few experiences are held here until enough steps have happened to know their n-step reward
+        self.n_step = n_step
+        self.gamma = gamma
+        self.pending = deque()
+
     #the *args means that the function can take any number of arguments, and they will be stored in a tuple called args
     #but in this case the tuple must have 5 elements, which is state, action, reward, next_state, and done
     def push(self, *args):
@@ -30,10 +77,56 @@ class ReplayMemory:
             state, action, reward, next_state, done.
         """
         
+        #an action that would turn the snake around is ignored by the game, which keeps going straight
+        #so it is stored as the straight action it really was, keeping every stored action a legal one
+        state, action = args[0], args[1]
+        if state[DIRECTION_START + REVERSE_ACTIONS[action]]:
+            args = (state, REVERSE_ACTIONS[action]) + args[2:]
+
         #adds a new experience to the memory buffer with the args tuple
         #the elements in the args tuple were what the state was, what action it took, what reward it got, what the next state became, and whether the game ended
         #this lets the AI look back at the memory buffer to look back at past experiences to learn from them
-        self.memory.append(args)
+        #every stored experience also records how many steps its reward was summed over, so the bootstrapped Q-value is discounted that many times
+        if self.n_step == 1:
+            self._store(tuple(args) + (1,))
+            return
+
+        #for n-step returns the experience waits until n steps have happened (or the game ended) before it is stored
+        self.pending.append(args)
+        done = args[4]
+        if done:
+            #the game ended, so every waiting experience gets the rewards up to the end of the game
+            while self.pending:
+                self._store(self._n_step_experience())
+                self.pending.popleft()
+        elif len(self.pending) == self.n_step:
+            self._store(self._n_step_experience())
+            self.pending.popleft()
+
+    def _store(self, experience):
+        """Stores one finished experience in the memory buffer."""
+        self.memory.append(experience)
+
+    def _n_step_experience(self):
+        """Combines the waiting experiences into one n-step experience for the oldest one."""
+        state, action = self.pending[0][0], self.pending[0][1]
+        _, _, _, next_state, done = self.pending[-1]
+        reward = 0.0
+        for i, experience in enumerate(self.pending):
+            reward += (self.gamma ** i) * experience[2]
+        return (state, action, reward, next_state, done, len(self.pending))
+
+    def end_episode(self):
+        """Stores the experiences still waiting for their n-step return at the end of an episode.
+
+        Only needed when an episode is cut off without the game ending, since
+        a finished game already stores every waiting experience. The game didn't
+        end, so each one gets the rewards up to the cut and is bootstrapped from
+        the last state with the discount of the steps it really covers.
+        """
+        while self.pending:
+            self._store(self._n_step_experience())
+            self.pending.popleft()
 
     def sample(self, batch_size):
         """Randomly samples a batch of experiences from the memory buffer.
@@ -47,14 +140,41 @@ class ReplayMemory:
         -------
         list
             A list of sampled experiences, each in the form of a tuple
-            (state, action, reward, next_state, done).
+            (state, action, reward, next_state, done, steps).
         """
 
         #this will randomly sample a batch of experiences from the memory
-        #returns a list of tuples, each containing a state, action, reward, next_state, and done
+        #returns a list of tuples, each containing a state, action, reward, next_state, done and the number of steps the reward covers
         #the tuples are the experiences from the memory buffer with the amount being batch_size
         return random.sample(self.memory, batch_size)
 
+    def sample_batch(self, batch_size, augment=False):
+        """Randomly samples a batch of experiences as one array per field.
+
+        Parameters
+        ----------
+        batch_size : int
+            The number of experiences to sample.
+        augment : bool
+            If True, randomly flips the experiences horizontally and vertically (see augment_batch).
+
+        Returns
+        -------
+        tuple
+            (states, actions, rewards, next_states, dones, discounts) as numpy arrays, where each discount
+            is gamma to the power of the number of steps between the state and its next state.
+        """
+
+        #separates each experience into 6 separate lists and turns each one into an array so it can be turned into a tensor without copying
+        states, actions, rewards, next_states, dones, steps = zip(*self.sample(batch_size))
+        states = np.array(states, dtype=np.float32)
+        actions = np.array(actions, dtype=np.int64)
+        next_states = np.array(next_states, dtype=np.float32)
+        if augment:
+            augment_batch(states, actions, next_states)
+        discounts = (self.gamma ** np.array(steps)).astype(np.float32)
+        return states, actions, np.array(rewards, dtype=np.float32), next_states, np.array(dones, dtype=np.float32), discounts
+
     def __len__(self):
         """Returns the current number of experiences stored in the memory buffer.
 
@@ -79,8 +199,34 @@ class ReplayMemory:
         #saves the memory buffer to a pkl file
         #uses the pickle module to serialize the memory buffer and save it to a file
         #this lets you pause and resume training because it is saved to a file
+        #the n_step and gamma are saved with it since the stored rewards were summed with them
         with open(filename, 'wb') as f:
-            pickle.dump(list(self.memory), f)
+            pickle.dump({'n_step': self.n_step, 'gamma': self.gamma, 'experiences': list(self.memory)}, f)
+
+    def _matches(self, n_step, gamma, filename):
+        """Returns whether experiences saved with n_step and gamma can be learned from by this memory.
+
+        Parameters
+        ----------
+        n_step : int
+            The n_step the experiences were stored with.
+        gamma : float
+            The gamma the n-step rewards were summed with (None if unknown).
+        filename : str
+            The file they came from, for the message printed when they don't match.
+
+        Returns
+        -------
+        bool
+            True if the experiences can be used.
+        """
+
+        #1-step rewards don't depend on gamma, but n-step rewards were summed with it and would be bootstrapped with the wrong discount
+        if n_step == self.n_step and (n_step == 1 or gamma == self.gamma):
+            return True
+        print(f"Memory file {filename} was saved with n_step={n_step}, gamma={gamma}, but this memory uses "
+              f"n_step={self.n_step}, gamma={self.gamma}. Starting with empty memory.")
+        return False
     
     def load(self, filename):
         """Loads the memory buffer from a file.
@@ -93,11 +239,218 @@ class ReplayMemory:
         try:
             #attemps to open the file given by the filename parameter
             with open(filename, 'rb') as f:
-                #loads the memory buffer from the file into this list variable
-                memory_list = pickle.load(f)
-                #this creates a new deque object from the memory_list variable which holds the experiences from the file
-                #the max length of the deque object is the same as the current memory buffer so that the memory buffer can be swapped out without losing any experiences
-                self.memory = deque(memory_list, maxlen=self.memory.maxlen)
+                #loads the memory buffer from the file
+                saved = pickle.load(f)
+            #files saved before n-step returns were added are a plain list of 1-step experiences
+            if isinstance(saved, list):
+                saved = {'n_step': 1, 'gamma': None, 'experiences': saved}
+            if not self._matches(saved['n_step'], saved['gamma'], filename):
+                return
+            #old files can still hold turn-around actions, so they are stored as the straight action they really were, just like push does
+            #they also don't record the steps of each experience, but back then every experience that wasn't the end of a game covered n_step steps
+            memory_list = []
+            for state, action, reward, next_state, done, *steps in saved['experiences']:
+                if state[DIRECTION_START + REVERSE_ACTIONS[action]]:
+                    action = REVERSE_ACTIONS[action]
+                memory_list.append((state, action, reward, next_state, done, steps[0] if steps else self.n_step))
+            #this creates a new deque object from the memory_list variable which holds the experiences from the file
+            #the max length of the deque object is the same as the current memory buffer so that the memory buffer can be swapped out without losing any experiences
+            self.memory = deque(memory_list, maxlen=self.memory.maxlen)
         except FileNotFoundError:
             #if the file is not found where the filename parameter says it is, then it will give an error which will print the following message
             print(f"Memory file {filename} not found. Starting with empty memory.")
+
+
+#the first 5 values of a state (positions and the distance to the apple) are real numbers
+#the last 8 (the direction the snake is going and the danger indicators) are always 0 or 1, so they fit in the bits of a single byte
+NUM_FLOAT_FEATURES = 5
+NUM_BINARY_FEATURES = 8
+
+#a replay memory for very large buffers that stores the experiences in numpy arrays instead of tuples of python lists
+#each state is stored once and experiences point to their state and next state by index, since the next state of one step is the state of the next step
+class CompactReplayMemory(ReplayMemory):
+    def __init__(self, capacity, n_step=1, gamma=0.99):
+        """Initializes the CompactReplayMemory object with a given capacity.
+
+        Parameters
+        ----------
+        capacity : int
+            The maximum number of experiences.
+        n_step : int
+            The number of steps the stored rewards are summed over (1 stores plain transitions).
+        gamma : float
+            The discount factor used to sum the n-step rewards.
+        """
+        super().__init__(capacity, n_step, gamma)
+        self.capacity = capacity
+
+        #every experience adds at most 2 new states, but it can also point to a state that was added up to n_step + 1 states before it
+        #(an n-step experience shares its state with the next state of an earlier one, even when it is stored late at the end of a cut off episode)
+        #so the oldest live state is at most 2 * capacity + n_step + 1 states old, and a ring that big never overwrites a state an experience still points to
+        self.state_capacity = self._state_capacity(capacity, n_step)
+        self.state_floats = np.zeros((self.state_capacity, NUM_FLOAT_FEATURES), dtype=np.float32)
+        self.state_bits = np.zeros(self.state_capacity, dtype=np.uint8)
+        self.state_position = 0
+
+        self.state_indices = np.zeros(capacity, dtype=np.int32)
+        self.next_state_indices = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        self.steps = np.zeros(capacity, dtype=np.uint8)
+        self.position = 0
+        self.size = 0
+
+        #the states stored during the current episode (only the last few can be shared again) mapped to their index
+        self.recent_states = {}
+        self.recent_order = deque()
+
+    @staticmethod
+    def _state_capacity(capacity, n_step):
+        return 2 * capacity + n_step + 1
+
+    def _add_state(self, state):
+        """Returns the index of a state, storing it unless it was stored recently in this episode."""
+        key = tuple(state)
+        index = self.recent_states.get(key)
+        if index is not None:
+            return index
+
+        index = self.state_position
+        self.state_floats[index] = state[:NUM_FLOAT_FEATURES]
+        self.state_bits[index] = np.packbits(np.asarray(state[NUM_FLOAT_FEATURES:]) > 0.5)[0]
+        self.state_position = (self.state_position + 1) % self.state_capacity
+
+        #with n-step returns the next state of one experience is the state of the experience n steps later, so the last n + 1 states are kept
+        self.recent_states[key] = index
+        self.recent_order.append(key)
+        if len(self.recent_order) > self.n_step + 1:
+            del self.recent_states[self.recent_order.popleft()]
+        return index
+
+    def _store(self, experience):
+        state, action, reward, next_state, done, steps = experience
+        self.state_indices[self.position] = self._add_state(state)
+        self.next_state_indices[self.position] = self._add_state(next_state)
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.dones[self.position] = done
+        self.steps[self.position] = steps
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push(self, *args):
+        """Adds a new experience to the memory buffer (state, action, reward, next_state, done)."""
+        super().push(*args)
+        if args[4]:
+            self._clear_recent_states()
+
+    def _clear_recent_states(self):
+        #states are never shared across episodes, so the first state of a new episode is never linked to the end of the last one
+        self.recent_states.clear()
+        self.recent_order.clear()
+
+    def end_episode(self):
+        """Stores the experiences still waiting for their n-step return and starts a new episode."""
+        super().end_episode()
+        self._clear_recent_states()
+
+    def _grow_states(self):
+        """Grows a state ring loaded from a file saved with a smaller one, keeping the order states are overwritten in."""
+        #the new slots go in right where the next state is written, so the oldest states are still the next ones overwritten
+        extra = self.state_capacity - len(self.state_floats)
+        position = self.state_position
+        self.state_floats = np.concatenate((self.state_floats[:position], np.zeros((extra, NUM_FLOAT_FEATURES), dtype=np.float32), self.state_floats[position:]))
+        self.state_bits = np.concatenate((self.state_bits[:position], np.zeros(extra, dtype=np.uint8), self.state_bits[position:]))
+        self.state_indices = np.where(self.state_indices >= position, self.state_indices + extra, self.state_indices).astype(np.int32)
+        self.next_state_indices = np.where(self.next_state_indices >= position, self.next_state_indices + extra, self.next_state_indices).astype(np.int32)
+
+    def _states(self, indices):
+        """Rebuilds full float32 states from stored state indices."""
+        bits = np.unpackbits(self.state_bits[indices][:, None], axis=1)
+        return np.concatenate((self.state_floats[indices], bits.astype(np.float32)), axis=1)
+
+    def sample_batch(self, batch_size, augment=False):
+        """Randomly samples a batch of experiences as one array per field.
+
+        Unlike ReplayMemory, the batch is drawn with replacement, which is
+        much faster for large buffers.
+
+        Parameters
+        ----------
+        batch_size : int
+            The number of experiences to sample.
+        augment : bool
+            If True, randomly flips the experiences horizontally and vertically (see augment_batch).
+
+        Returns
+        -------
+        tuple
+            (states, actions, rewards, next_states, dones, discounts) as numpy arrays.
+        """
+        indices = np.random.randint(0, self.size, batch_size)
+        states = self._states(self.state_indices[indices])
+        actions = self.actions[indices].astype(np.int64)
+        next_states = self._states(self.next_state_indices[indices])
+        if augment:
+            augment_batch(states, actions, next_states)
+        discounts = (self.gamma ** self.steps[indices]).astype(np.float32)
+        return states, actions, self.rewards[indices], next_states, self.dones[indices].astype(np.float32), discounts
+
+    def sample(self, batch_size):
+        """Randomly samples a batch of experiences as a list of (state, action, reward, next_state, done, steps) tuples."""
+        indices = np.random.randint(0, self.size, batch_size)
+        states = self._states(self.state_indices[indices])
+        next_states = self._states(self.next_state_indices[indices])
+        return [(s.tolist(), int(a), float(r), n.tolist(), bool(d), int(k)) for s, a, r, n, d, k in
+                zip(states, self.actions[indices], self.rewards[indices], next_states, self.dones[indices], self.steps[indices])]
+
+    def __len__(self):
+        return self.size
+
+    def save(self, filename):
+        """Saves the memory arrays to a numpy .npz file.
+
+        Parameters
+        ----------
+        filename : str
+            The filename to save the memory to.
+        """
+        with open(filename, 'wb') as f:
+            np.savez(f, state_floats=self.state_floats, state_bits=self.state_bits, state_indices=self.state_indices,
+                     next_state_indices=self.next_state_indices, actions=self.actions, rewards=self.rewards, dones=self.dones,
+                     steps=self.steps, positions=np.array([self.state_position, self.position, self.size]),
+                     n_step=np.array(self.n_step), gamma=np.array(self.gamma))
+
+    def load(self, filename):
+        """Loads the memory arrays from a numpy .npz file.
+
+        Parameters
+        ----------
+        filename : str
+            The filename to load the memory from.
+        """
+        try:
+            with np.load(filename) as data:
+                #files saved before the n_step and gamma were recorded are treated like 1-step memories
+                n_step = int(data['n_step']) if 'n_step' in data else 1
+                gamma = float(data['gamma']) if 'gamma' in data else None
+                if not self._matches(n_step, gamma, filename):
+                    return
+                if len(data['actions']) != self.capacity:
+                    raise ValueError(f"Memory file {filename} has capacity {len(data['actions'])}, expected {self.capacity}")
+                self.state_floats = data['state_floats']
+                self.state_bits = data['state_bits']
+                self.state_indices = data['state_indices']
+                self.next_state_indices = data['next_state_indices']
+                self.actions = data['actions']
+                self.rewards = data['rewards']
+                self.dones = data['dones']
+                #files saved before the steps were recorded only held experiences of n_step steps (or the end of a game)
+                self.steps = data['steps'] if 'steps' in data else np.full(self.capacity, n_step, dtype=np.uint8)
+                self.state_position, self.position, self.size = (int(value) for value in data['positions'])
+                if len(self.state_floats) < self.state_capacity:
+                    self._grow_states()
+        except FileNotFoundError:
+            print(f"Memory file {filename} not found. Starting with empty memory.")
+        self._clear_recent_states()
@@ -0,0 +1,227 @@
+"""
+Population-based training: many agent pairs train at once, the best ones are copied and their hyperparameters perturbed.
+
+A member of the population is a plain dictionary (hyperparameters, network and
+optimizer state dicts, replay memories, epsilons and step count) so it can be
+sent to worker processes and saved in a checkpoint as is.
+"""
+
+import copy
+import os
+import random
+import torch
+
+from .snake import SnakeGame
+from .dqn import DQN, select_action, update_network
+from .memory import ReplayMemory
+from .target_network import TargetNetworkUpdater
+from .runtime import configure_runtime
+
+#the hyperparameters every member starts from and the (min, max) range they are kept within when perturbed
+DEFAULT_HPARAMS = {
+    'lr': 0.0001,
+    'update_freq': 16,
+    'tau': 0.005,
+    'epsilon_decay': 0.9999,
+}
+HPARAM_RANGES = {
+    'lr': (1e-5, 1e-2),
+    'update_freq': (1, 64),
+    'tau': (1e-4, 0.1),
+    'epsilon_decay': (0.999, 0.99999),
+}
+PERTURB_FACTORS = (0.8, 1.2)
+#the replay memories sum rewards over the same number of steps as main.py and pretrain.py, so the saved agents learned the same targets
+N_STEP = 3
+GAMMA = 0.99
+
+
+def _build_networks(hparams):
+    """Creates the networks and optimizers of one agent pair."""
+    networks = []
+    for _ in range(2):
+        q_network = DQN(13, 128, 4)
+        target_network = DQN(13, 128, 4)
+        optimizer = torch.optim.Adam(q_network.parameters(), lr=hparams['lr'])
+        networks.append((q_network, target_network, optimizer))
+    return networks
+
+
+def new_member(member_id, hparams=None, memory_capacity=10000, n_step=N_STEP, gamma=GAMMA):
+    """Creates a member with freshly initialized agents and empty n-step replay memories."""
+    hparams = dict(DEFAULT_HPARAMS if hparams is None else hparams)
+    networks = _build_networks(hparams)
+    for q_network, target_network, _ in networks:
+        target_network.load_state_dict(q_network.state_dict())
+    return {
+        'id': member_id,
+        'hparams': hparams,
+        'networks': [(q.state_dict(), t.state_dict(), o.state_dict()) for q, t, o in networks],
+        'memories': [ReplayMemory(memory_capacity, n_step=n_step, gamma=gamma) for _ in range(2)],
+        'epsilons': [1.0, 1.0],
+        'step_count': 0,
+        'score': 0.0,
+        'history': [],
+    }
+
+
+def _load_networks(member):
+    networks = _build_networks(member['hparams'])
+    for (q_network, target_network, optimizer), (q_state, target_state, optimizer_state) in zip(networks, member['networks']):
+        q_network.load_state_dict(q_state)
+        target_network.load_state_dict(target_state)
+        optimizer.load_state_dict(optimizer_state)
+        #a perturbed learning rate has to override the one saved with the optimizer
+        for group in optimizer.param_groups:
+            group['lr'] = member['hparams']['lr']
+    return networks
+
+
+def train_member(member, episodes, max_steps=200, batch_size=128, seed=0):
+    """
+    Trains both agents of a member by self-play for a number of episodes.
+
+    Args:
+        member (dict): The member to train.
+        episodes (int): The number of episodes to play.
+        max_steps (int): The number of steps before an episode is cut off.
+        batch_size (int): The batch size of each network update.
+        seed (int): The random seed for this round.
+
+    Returns:
+        dict: The trained member.
+    """
+    configure_runtime(1, 1)
+    random.seed(seed)
+    torch.manual_seed(seed)
+    hparams = member['hparams']
+    networks = _load_networks(member)
+    memories = member['memories']
+    epsilons = member['epsilons']
+    step_count = member['step_count']
+    target_updater = TargetNetworkUpdater([(q, t) for q, t, _ in networks], hparams['tau'])
+    game = SnakeGame(render=False)
+    total_reward = 0.0
+
+    for _ in range(episodes):
+        game.reset()
+        done1 = done2 = False
+        steps = 0
+        while not (done1 or done2) and steps < max_steps:
+            state1 = game.get_state(1)
+            state2 = game.get_state(2)
+            action1 = select_action(state1, networks[0][0], epsilons[0])
+            action2 = select_action(state2, networks[1][0], epsilons[1])
+            (next_state1, reward1, done1), (next_state2, reward2, done2) = game.step(action1, action2)
+            memories[0].push(state1, action1, reward1, next_state1, done1)
+            memories[1].push(state2, action2, reward2, next_state2, done2)
+            if step_count % int(hparams['update_freq']) == 0:
+                for (q_network, target_network, optimizer), memory in zip(networks, memories):
+                    update_network(q_network, target_network, optimizer, memory, batch_size, double=True)
+                target_updater.step(step_count)
+            total_reward += reward1 + reward2
+            step_count += 1
+            steps += 1
+            epsilons = [max(0.01, epsilon * hparams['epsilon_decay']) for epsilon in epsilons]
+        for memory in memories:
+            memory.end_episode()
+
+    member['networks'] = [(q.state_dict(), t.state_dict(), o.state_dict()) for q, t, o in networks]
+    member['epsilons'] = epsilons
+    member['step_count'] = step_count
+    member['history'].append(total_reward / (2 * episodes))
+    return member
+
+
+def play_match(q_state1, q_state2, games, max_steps=500, seed=0):
+    """
+    Plays greedy games between two agents and returns how many more games the first one won.
+
+    Args:
+        q_state1 (dict): The state dict of the network playing snake 1.
+        q_state2 (dict): The state dict of the network playing snake 2.
+        games (int): The number of games to play.
+        max_steps (int): The number of steps before a game is cut off.
+        seed (int): The random seed for the apple positions.
+
+    Returns:
+        int: Wins of the first agent minus wins of the second agent.
+    """
+    configure_runtime(1, 1)
+    random.seed(seed)
+    q_network1 = DQN(13, 128, 4)
+    q_network1.load_state_dict(q_state1)
+    q_network2 = DQN(13, 128, 4)
+    q_network2.load_state_dict(q_state2)
+    game = SnakeGame(render=False)
+    balance = 0
+    for _ in range(games):
+        game.reset()
+        done1 = done2 = False
+        reward1 = reward2 = 0
+        steps = 0
+        while not (done1 or done2) and steps < max_steps:
+            action1 = select_action(game.get_state(1), q_network1, 0.0)
+            action2 = select_action(game.get_state(2), q_network2, 0.0)
+            (_, reward1, done1), (_, reward2, done2) = game.step(action1, action2)
+            steps += 1
+        if done1 or done2:
+            balance += (reward1 > reward2) - (reward2 > reward1)
+    return balance
+
+
+def perturb(hparams):
+    """Returns a copy of hparams with every value scaled up or down and kept within HPARAM_RANGES."""
+    perturbed = {}
+    for name, value in hparams.items():
+        low, high = HPARAM_RANGES[name]
+        factor = random.choice(PERTURB_FACTORS)
+        if name == 'epsilon_decay':
+            #scales how far the decay is from 1 so it can never go past 1
+            value = 1 - (1 - value) * factor
+        else:
+            value = value * factor
+        value = min(high, max(low, value))
+        if name == 'update_freq':
+            value = max(1, round(value))
+        perturbed[name] = value
+    return perturbed
+
+
+def exploit_and_explore(members, fraction=0.25):
+    """
+    Replaces the worst members with copies of the best ones and perturbs their hyperparameters.
+
+    The members are ranked by their 'score'. The replaced members keep their
+    id and their own replay memories, but take the networks, optimizers and
+    epsilons of a randomly chosen top member.
+
+    Returns:
+        list: (replaced id, copied id) pairs.
+    """
+    ranked = sorted(members, key=lambda member: member['score'], reverse=True)
+    count = max(1, int(len(ranked) * fraction))
+    replaced = []
+    for loser in ranked[-count:]:
+        winner = random.choice(ranked[:count])
+        loser['networks'] = copy.deepcopy(winner['networks'])
+        loser['epsilons'] = list(winner['epsilons'])
+        loser['hparams'] = perturb(winner['hparams'])
+        replaced.append((loser['id'], winner['id']))
+    return replaced
+
+
+def save_checkpoint(path, population_round, members):
+    """Saves the whole population so the run can be resumed after this round."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    #writes to a temporary file first so an interrupted save never corrupts the last checkpoint
+    temp_path = path + '.tmp'
+    torch.save({'round': population_round, 'members': members, 'rng': random.getstate()}, temp_path)
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+    """Loads a population checkpoint and returns (next round, members)."""
+    checkpoint = torch.load(path, weights_only=False)
+    random.setstate(checkpoint['rng'])
+    return checkpoint['round'] + 1, checkpoint['members']
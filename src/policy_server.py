@@ -0,0 +1,266 @@
+"""
+An asyncio policy server that answers action requests for trained agents over a TCP or Unix socket.
+
+The protocol is one JSON object per line. A request looks like
+{"id": 7, "agent": "1", "state": [13 numbers]} and the answer is
+{"id": 7, "action": 2, "q_values": [4 numbers]} (or {"id": 7, "error": "..."}).
+A client can send many requests without waiting, since answers carry the id
+of their request. Requests that arrive close together are answered with a
+single forward pass per agent. A line that isn't valid JSON gets an error
+answer with id null; a line longer than the stream limit gets one too, and
+the connection is closed once the requests before it have been answered.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import os
+import socket
+import torch
+
+from .dqn import DQN, illegal_action_mask
+
+
+class PolicyServer:
+    """Serves the actions of one or more DQN checkpoints to many clients at once."""
+
+    def __init__(self, checkpoints, max_batch=256, max_delay=0.002, reload_interval=1.0, dueling=False):
+        """
+        Args:
+            checkpoints (dict): Agent names mapped to the paths of their .pth files.
+            max_batch (int): The most requests answered by one forward pass.
+            max_delay (float): The longest (in seconds) a request waits for others to batch with.
+            reload_interval (float): How often (in seconds) the checkpoints are checked for changes.
+            dueling (bool): Whether the checkpoints use the dueling architecture.
+        """
+        self.checkpoints = dict(checkpoints)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.reload_interval = reload_interval
+        self.dueling = dueling
+        self.networks = {}
+        self.modified_times = {}
+        self.requests = None
+        self.batches_served = 0
+        self.requests_served = 0
+        for agent in self.checkpoints:
+            self._load(agent)
+
+    def _load(self, agent):
+        """Loads (or reloads) an agent's checkpoint, keeping the old network if the file can't be read."""
+        path = self.checkpoints[agent]
+        try:
+            modified_time = os.path.getmtime(path)
+            q_network = DQN(13, 128, 4, dueling=self.dueling)
+            q_network.load_weights(torch.load(path))
+            q_network.eval()
+        except (OSError, RuntimeError, EOFError, ValueError) as error:
+            #a checkpoint that is still being written fails to load, so it is tried again next time
+            print(f"Could not load {path} for agent {agent}: {error}")
+            return
+        #swapping the reference is atomic for the batcher, so requests in flight are never dropped
+        self.networks[agent] = q_network
+        self.modified_times[agent] = modified_time
+        print(f"Loaded agent {agent} from {path}")
+
+    async def _watch_checkpoints(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            for agent, path in self.checkpoints.items():
+                try:
+                    modified_time = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if modified_time != self.modified_times.get(agent):
+                    self._load(agent)
+
+    async def _batch_requests(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            #waits for the first request, then gathers any others that arrive before the deadline
+            batch = [await self.requests.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.requests.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._answer(batch)
+
+    def _answer(self, batch):
+        """Runs one forward pass per agent in the batch and resolves every request's future."""
+        by_agent = {}
+        for agent, state, future in batch:
+            by_agent.setdefault(agent, []).append((state, future))
+        for agent, requests in by_agent.items():
+            try:
+                states = torch.tensor([state for state, _ in requests], dtype=torch.float32)
+                with torch.no_grad():
+                    q_values = self.networks[agent](states)
+                actions = q_values.masked_fill(illegal_action_mask(states), float('-inf')).argmax(1)
+            except RuntimeError as error:
+                #a failed forward pass only fails the requests in it, the batcher keeps running
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), action, values in zip(requests, actions.tolist(), q_values.tolist()):
+                if not future.done():
+                    future.set_result((action, values))
+        self.batches_served += 1
+        self.requests_served += len(batch)
+
+    async def act(self, agent, state):
+        """Queues one request and returns (action, q_values) once its batch has run."""
+        if agent not in self.networks:
+            raise KeyError(f"unknown agent {agent!r}")
+        state = [float(value) for value in state]
+        if len(state) != 13:
+            raise ValueError(f"state has {len(state)} values, expected 13")
+        #json.loads accepts NaN and Infinity, which would come back as NaN q_values that aren't valid JSON
+        if not all(math.isfinite(value) for value in state):
+            raise ValueError("state has values that aren't finite")
+        future = asyncio.get_running_loop().create_future()
+        await self.requests.put((agent, state, future))
+        return await future
+
+    async def _respond(self, request, writer):
+        try:
+            action, q_values = await self.act(str(request['agent']), request['state'])
+            response = {'id': request.get('id'), 'action': action, 'q_values': q_values}
+        except (KeyError, ValueError, TypeError, RuntimeError) as error:
+            response = {'id': request.get('id') if isinstance(request, dict) else None, 'error': str(error)}
+        writer.write((json.dumps(response) + '\n').encode())
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _handle_client(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as error:
+                    #a line longer than the stream limit can't be resynchronized with, so the requests
+                    #already queued are answered and then the connection is closed
+                    writer.write((json.dumps({'id': None, 'error': f'request too long: {error}'}) + '\n').encode())
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    #covers both malformed JSON and bytes that aren't UTF-8
+                    writer.write((json.dumps({'id': None, 'error': str(error)}) + '\n').encode())
+                    continue
+                task = asyncio.create_task(self._respond(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Serves requests until cancelled, on a Unix socket if unix_path is given, otherwise on TCP."""
+        self.requests = asyncio.Queue()
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self._handle_client, path=unix_path)
+            print(f"Serving {list(self.networks)} on {unix_path}")
+        else:
+            server = await asyncio.start_server(self._handle_client, host, port)
+            print(f"Serving {list(self.networks)} on {host}:{port}")
+        background = [asyncio.create_task(self._batch_requests()), asyncio.create_task(self._watch_checkpoints())]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in background:
+                task.cancel()
+
+
+class PolicyClient:
+    """An asyncio client that can have many requests to a PolicyServer in flight on one connection."""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.ids = itertools.count()
+        self.read_task = None
+
+    async def connect(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.read_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.pending.pop(response['id'], None)
+            if future is not None:
+                future.set_result(response)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError('policy server closed the connection'))
+
+    async def act(self, agent, state):
+        """Returns the action the server's agent picks for a state."""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write((json.dumps({'id': request_id, 'agent': agent, 'state': state}) + '\n').encode())
+        response = await future
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['action']
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.read_task.cancel()
+
+
+class RemotePolicy:
+    """A blocking client for game loops that aren't async, usable in place of a local DQN's select_action."""
+
+    def __init__(self, agent, host='127.0.0.1', port=8765, unix_path=None):
+        self.agent = agent
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(unix_path)
+        else:
+            self.socket = socket.create_connection((host, port))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile('rb')
+
+    def select_action(self, state):
+        """Returns the action the server's agent picks for a state."""
+        self.socket.sendall((json.dumps({'id': 0, 'agent': self.agent, 'state': state}) + '\n').encode())
+        response = json.loads(self.file.readline())
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['action']
+
+    def __call__(self, game_state, snake_num):
+        #the same signature as the scripted and env opponent policies
+        return self.select_action(game_state.get_state(snake_num))
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
@@ -0,0 +1,67 @@
+"""
+Per-process torch runtime settings (threads, core pinning, compilation) for the small DQN workloads.
+"""
+
+import os
+import torch
+
+
+def configure_runtime(num_threads=1, interop_threads=1, cpu_cores=None):
+    """
+    Sets how many threads torch uses in this process and optionally pins the process to some cores.
+
+    The DQN is tiny (13 -> 128 -> 128 -> 4), so splitting one forward or backward
+    pass across many threads costs more in synchronization than it saves. When
+    several training processes share a machine, one or two threads each and
+    pinning each process to its own cores stops them from fighting over cores.
+
+    Args:
+        num_threads (int): The number of intra-op threads (None leaves torch's default).
+        interop_threads (int): The number of inter-op threads (None leaves torch's default).
+        cpu_cores (list): The cores to pin this process to (None leaves it unpinned). Only works on Linux.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    if interop_threads is not None:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            #can only be set once, before any inter-op parallel work has started
+            pass
+    if cpu_cores is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpu_cores)
+
+
+def cores_for_process(process_index, threads_per_process):
+    """Returns the block of cores that the process_index-th worker should be pinned to."""
+    if hasattr(os, 'sched_getaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    start = (process_index * threads_per_process) % len(available)
+    return [available[(start + i) % len(available)] for i in range(threads_per_process)]
+
+
+def optimize_model(model, compile=False):
+    """
+    Prepares a model for fast CPU execution.
+
+    The weights are made contiguous, and with compile the model is compiled in
+    place with torch.compile (which keeps the state_dict keys the same so saved
+    weights still load). Channels-last layouts only apply to 4D image tensors,
+    so they don't apply to this fully connected network.
+
+    Args:
+        model (torch.nn.Module): The model to prepare.
+        compile (bool): If True, compiles the model with torch.compile.
+
+    Returns:
+        torch.nn.Module: The same model.
+    """
+    with torch.no_grad():
+        for param in model.parameters():
+            if not param.is_contiguous():
+                param.data = param.data.contiguous()
+    if compile:
+        model.compile(dynamic=True)
+    return model
@@ -0,0 +1,127 @@
+"""
+Episode scheduling: cutting off games that have stalled and scaling the step limit with the length of the snakes.
+
+Episodes that are cut off here are truncations, not terminations: the game
+didn't end, so the last experiences are stored with done=False and
+memory.end_episode() stores the n-step experiences still waiting for their
+return with the rewards up to the cut, bootstrapped from the last state,
+instead of treating the cut as a death.
+"""
+
+import random
+from collections import Counter
+from .game_config import GRID_COLS, GRID_ROWS
+from .game_state import to_cell
+
+#random 64 bit keys for every cell, XORed together into a hash of a snake's body (Zobrist hashing)
+#they come from their own generator so building them doesn't move the game's random numbers
+_keys = random.Random(0)
+BODY_KEYS = [_keys.getrandbits(64) for _ in range(GRID_COLS * GRID_ROWS)]
+HEAD_KEYS = [_keys.getrandbits(64) for _ in range(GRID_COLS * GRID_ROWS)]
+
+
+class EpisodeScheduler:
+    """
+    Decides when an episode should be cut off.
+
+    Call reset(game_state) after every game reset and step(game_state) after
+    every game step that didn't end the game. step returns None while the
+    episode should go on, otherwise the reason it was cut off:
+
+    'max_steps': the step limit was reached. The limit grows with the
+        longest snake, so games where the snakes keep eating get longer.
+    'stall': no snake has eaten an apple for too many steps.
+    'cycle': the game has been in exactly the same state (every snake's body
+        and heading, and the apple) cycle_repeats times since the last apple,
+        so the snakes are going in circles.
+
+    Each snake's body is hashed with a rolling Zobrist hash, updated with
+    the new head and the old tail every step, so checking for cycles costs
+    the same no matter how long the snakes are. Only whole-game repeats
+    count, since a single short snake moving at random comes back to the
+    same cell all the time without being stuck.
+    """
+
+    def __init__(self, max_steps=500, steps_per_length=0, max_steps_cap=None,
+                 stall_steps=None, stall_steps_per_length=0, cycle_repeats=None):
+        """
+        Args:
+            max_steps (int): The step limit of an episode with short snakes.
+            steps_per_length (int): The step limit is at least this times the length of the longest snake.
+            max_steps_cap (int): The highest the step limit can grow to (None for no cap).
+            stall_steps (int): The number of steps without an apple before an episode is cut off (None turns this off).
+            stall_steps_per_length (int): Extra steps without an apple allowed per segment of the longest
+                snake, since long snakes need more moves to get around themselves.
+            cycle_repeats (int): How many times the game can be in the same state before the episode
+                is cut off (None turns this off).
+        """
+        self.max_steps = max_steps
+        self.steps_per_length = steps_per_length
+        self.max_steps_cap = max_steps_cap
+        self.stall_steps = stall_steps
+        self.stall_steps_per_length = stall_steps_per_length
+        self.cycle_repeats = cycle_repeats
+        #how many episodes were cut off for each reason, for the training stats
+        self.truncations = Counter()
+
+    def reset(self, game_state):
+        """Starts tracking a new episode."""
+        self.steps = 0
+        self.steps_since_apple = 0
+        self.lengths = [len(body) for body in game_state.snakes]
+        self.tails = [body[-1] for body in game_state.snakes]
+        self.hashes = []
+        for body in game_state.snakes:
+            body_hash = 0
+            for pos in body:
+                body_hash ^= BODY_KEYS[to_cell(pos)]
+            self.hashes.append(body_hash)
+        self.visits = Counter()
+
+    def step_limit(self):
+        """Returns the current step limit, which depends on the length of the longest snake."""
+        limit = max(self.max_steps, self.steps_per_length * max(self.lengths))
+        if self.max_steps_cap is not None:
+            limit = min(limit, self.max_steps_cap)
+        return limit
+
+    def step(self, game_state):
+        """
+        Records one game step and returns why the episode should be cut off, or None to keep going.
+        """
+        self.steps += 1
+        self.steps_since_apple += 1
+        ate = False
+        position = []
+        for i, (body, direction) in enumerate(zip(game_state.snakes, game_state.directions)):
+            #the head moved onto a new cell, and unless the snake grew its old tail cell was freed
+            self.hashes[i] ^= BODY_KEYS[to_cell(body[0])]
+            if len(body) == self.lengths[i]:
+                self.hashes[i] ^= BODY_KEYS[to_cell(self.tails[i])]
+            else:
+                ate = True
+            self.lengths[i] = len(body)
+            self.tails[i] = body[-1]
+            position.append(self.hashes[i] ^ HEAD_KEYS[to_cell(body[0])])
+            position.append(direction)
+
+        cycling = False
+        if ate:
+            #the apple moved and a snake grew, so no state before this step can come up again
+            self.steps_since_apple = 0
+            self.visits.clear()
+        elif self.cycle_repeats is not None:
+            position = tuple(position)
+            self.visits[position] += 1
+            cycling = self.visits[position] >= self.cycle_repeats
+
+        reason = None
+        if self.steps >= self.step_limit():
+            reason = 'max_steps'
+        elif self.stall_steps is not None and self.steps_since_apple >= self.stall_steps + self.stall_steps_per_length * max(self.lengths):
+            reason = 'stall'
+        elif cycling:
+            reason = 'cycle'
+        if reason is not None:
+            self.truncations[reason] += 1
+        return reason
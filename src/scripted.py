@@ -0,0 +1,186 @@
+"""
+Scripted (non-learning) snake policies used as curriculum opponents and evaluation baselines.
+
+Every policy is called as policy(game_state, snake_num) and returns an action
+(0 is right, 1 is left, 2 is up, and 3 is down), the same as the opponent
+policies in envs.py. Random choices come from game_state.rng, the game's own
+generator (the random module unless the game was given one). Pathfinding runs
+on grid cell indices with a neighbor table that is built once, over a copy of
+the game's occupancy grid. The BFS distance maps are cached on that grid and
+the target cell, which every snake (and identical positions in other games)
+share; A* searches depend on each snake's own position, so they aren't cached.
+"""
+
+import heapq
+from collections import deque
+from functools import lru_cache
+from .game_config import GRID_COLS, GRID_ROWS, REVERSE_ACTIONS
+from .game_state import to_cell
+
+NUM_CELLS = GRID_COLS * GRID_ROWS
+UNREACHABLE = NUM_CELLS
+
+#the actions in the same order as the direction names
+DIRECTION_ACTIONS = {'right': 0, 'left': 1, 'up': 2, 'down': 3}
+
+
+def _build_neighbors():
+    """Builds the (action, cell) pairs that can be reached from every cell in one move."""
+    neighbors = []
+    for cell in range(NUM_CELLS):
+        col, row = cell % GRID_COLS, cell // GRID_COLS
+        moves = []
+        if col + 1 < GRID_COLS:
+            moves.append((0, cell + 1))
+        if col > 0:
+            moves.append((1, cell - 1))
+        if row > 0:
+            moves.append((2, cell - GRID_COLS))
+        if row + 1 < GRID_ROWS:
+            moves.append((3, cell + GRID_COLS))
+        neighbors.append(tuple(moves))
+    return tuple(neighbors)
+
+
+NEIGHBORS = _build_neighbors()
+
+
+def _snakes(game_state, snake_num):
+    """Returns (own body, own direction, list of the other bodies) for the given snake."""
+    index = snake_num - 1
+    others = [body for i, body in enumerate(game_state.snakes) if i != index]
+    return game_state.snakes[index], game_state.directions[index], others
+
+
+def occupancy(game_state):
+    """
+    Returns the cells blocked next step as bytes (nonzero is blocked), indexed by cell.
+
+    It is a copy of the game's occupancy grid with every tail taken off,
+    since the tails move away on the next step (unless that snake eats),
+    which is also what lets a snake follow its own tail.
+    """
+    blocked = bytearray(game_state.occupancy)
+    for body in game_state.snakes:
+        #a tail off the board was never counted, so there is nothing to take off
+        if len(body) > 1 and game_state.is_occupied(body[-1]):
+            blocked[to_cell(body[-1])] -= 1
+    return bytes(blocked)
+
+
+@lru_cache(maxsize=4096)
+def distance_map(blocked, target):
+    """Returns the number of moves from every cell to target, avoiding blocked cells (BFS)."""
+    distances = [UNREACHABLE] * NUM_CELLS
+    distances[target] = 0
+    queue = deque([target])
+    while queue:
+        cell = queue.popleft()
+        next_distance = distances[cell] + 1
+        for _, neighbor in NEIGHBORS[cell]:
+            if distances[neighbor] == UNREACHABLE and not blocked[neighbor]:
+                distances[neighbor] = next_distance
+                queue.append(neighbor)
+    return tuple(distances)
+
+
+def a_star(blocked, start, reverse_action, goal):
+    """
+    Returns the first action of the shortest path from start to goal, or None if there isn't one.
+
+    The path can't start with reverse_action since the game ignores turning around.
+    """
+    goal_col, goal_row = goal % GRID_COLS, goal // GRID_COLS
+
+    def heuristic(cell):
+        return abs(cell % GRID_COLS - goal_col) + abs(cell // GRID_COLS - goal_row)
+
+    #every entry is (estimated total length, length so far, cell, first action of the path)
+    frontier = []
+    best = {start: 0}
+    for action, neighbor in NEIGHBORS[start]:
+        if action != reverse_action and not blocked[neighbor]:
+            best[neighbor] = 1
+            heapq.heappush(frontier, (1 + heuristic(neighbor), 1, neighbor, action))
+    while frontier:
+        _, length, cell, first_action = heapq.heappop(frontier)
+        if cell == goal:
+            return first_action
+        if length > best[cell]:
+            continue
+        for _, neighbor in NEIGHBORS[cell]:
+            if not blocked[neighbor] and length + 1 < best.get(neighbor, UNREACHABLE):
+                best[neighbor] = length + 1
+                heapq.heappush(frontier, (length + 1 + heuristic(neighbor), length + 1, neighbor, first_action))
+    return None
+
+
+def _moves(game_state, snake_num, blocked):
+    """Returns the (action, cell) pairs the snake can take without turning around, and whether each is safe."""
+    body, direction, _ = _snakes(game_state, snake_num)
+    head = to_cell(body[0])
+    reverse = REVERSE_ACTIONS[DIRECTION_ACTIONS[direction]]
+    return [(action, cell) for action, cell in NEIGHBORS[head] if action != reverse and not blocked[cell]]
+
+
+def _fallback_action(game_state, snake_num):
+    """The action that keeps going straight, used when every move is deadly."""
+    _, direction, _ = _snakes(game_state, snake_num)
+    return DIRECTION_ACTIONS[direction]
+
+
+def greedy_policy(game_state, snake_num):
+    """Moves to the safe neighboring cell closest to the apple (Manhattan distance)."""
+    blocked = occupancy(game_state)
+    moves = _moves(game_state, snake_num, blocked)
+    if not moves:
+        return _fallback_action(game_state, snake_num)
+    apple = to_cell(game_state.apple_pos)
+    apple_col, apple_row = apple % GRID_COLS, apple // GRID_COLS
+    return min(moves, key=lambda move: abs(move[1] % GRID_COLS - apple_col) + abs(move[1] // GRID_COLS - apple_row))[0]
+
+
+def bfs_policy(game_state, snake_num):
+    """
+    Follows the shortest path to the apple, falling back to chasing its own tail
+    when the apple can't be reached, and to any safe move after that.
+    """
+    blocked = occupancy(game_state)
+    moves = _moves(game_state, snake_num, blocked)
+    if not moves:
+        return _fallback_action(game_state, snake_num)
+
+    distances = distance_map(blocked, to_cell(game_state.apple_pos))
+    action, cell = min(moves, key=lambda move: distances[move[1]])
+    if distances[cell] != UNREACHABLE:
+        return action
+
+    body, _, _ = _snakes(game_state, snake_num)
+    distances = distance_map(blocked, to_cell(body[-1]))
+    action, cell = min(moves, key=lambda move: distances[move[1]])
+    if distances[cell] != UNREACHABLE:
+        return action
+    return game_state.rng.choice(moves)[0]
+
+
+def astar_policy(game_state, snake_num):
+    """
+    Follows an A* path to the apple that stays out of the cells the other snakes'
+    heads could move into, falling back to bfs_policy when there is no such path.
+    """
+    body, direction, other_bodies = _snakes(game_state, snake_num)
+    avoid = bytearray(occupancy(game_state))
+    for other_body in other_bodies:
+        for _, cell in NEIGHBORS[to_cell(other_body[0])]:
+            avoid[cell] = 1
+    action = a_star(avoid, to_cell(body[0]), REVERSE_ACTIONS[DIRECTION_ACTIONS[direction]], to_cell(game_state.apple_pos))
+    if action is not None:
+        return action
+    return bfs_policy(game_state, snake_num)
+
+
+POLICIES = {
+    'greedy': greedy_policy,
+    'bfs': bfs_policy,
+    'astar': astar_policy,
+}
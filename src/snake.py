@@ -12,11 +12,13 @@ class SnakeGame:
     Main game class that coordinates state management, game logic, and rendering.
     """
     
-    def __init__(self, render=True):
+    def __init__(self, render=True, num_snakes=2, rng=None):
         """
         Initializes the SnakeGame by setting up the game state, logic, and renderer.
+
+        The apples are placed with rng (a random.Random), or the random module if it isn't given.
         """
-        self.game_state = GameState()
+        self.game_state = GameState(num_snakes, rng)
         self.game_logic = GameLogic(self.game_state)
         self.renderer = GameRenderer(render)
         self.render = render
@@ -29,36 +31,41 @@ class SnakeGame:
         """Returns the current state for the specified snake."""
         return self.game_state.get_state(snake_num)
     
-    def step(self, action1, action2):
+    def get_action_mask(self, snake_num):
+        """Returns which actions are legal for the specified snake (1 is legal)."""
+        return self.game_state.get_action_mask(snake_num)
+
+    def step(self, *actions):
         """
-        Advances the game state by one step given the provided actions.
+        Advances the game state by one step given the provided actions (one per snake).
 
         The actions are integers representing the direction each snake should
         move in, where 0 is right, 1 is left, 2 is up, and 3 is down.
 
         Returns:
-            tuple: A tuple containing the new states, rewards, and done flags for both snakes.
+            tuple: A (state, reward, done) tuple for each snake, in snake order.
         """
+        if len(actions) != self.num_snakes:
+            raise ValueError(f"expected {self.num_snakes} actions, got {len(actions)}")
+
         #updates directions
-        self.game_logic.update_directions(action1, action2)
+        self.game_logic.update_directions(actions)
         
         #moves snakes
-        old_head1, old_head2, new_head1, new_head2 = self.game_logic.move_snakes()
+        old_heads, new_heads = self.game_logic.move_snakes()
         
         #handles apple collection
-        reward1, reward2, grow1, grow2 = self.game_logic.handle_apple_collection(new_head1, new_head2)
+        rewards, grows = self.game_logic.handle_apple_collection(new_heads)
         
         #calculates distance-based rewards
-        reward1, reward2 = self.game_logic.calculate_distance_rewards(
-            old_head1, old_head2, new_head1, new_head2, reward1, reward2
-        )
+        rewards = self.game_logic.calculate_distance_rewards(old_heads, new_heads, rewards)
         
         #handles the growth of the snake
-        self.game_logic.handle_snake_growth(grow1, grow2)
+        self.game_logic.handle_snake_growth(grows)
         
         #detects and handles collisions with the snakes
-        collisions = self.game_logic.detect_collisions(new_head1, new_head2)
-        reward1, reward2 = self.game_logic.handle_collisions(collisions, reward1, reward2)
+        collisions = self.game_logic.detect_collisions(new_heads)
+        rewards = self.game_logic.handle_collisions(collisions, rewards)
         
         #renders if it is enabled
         if self.render:
@@ -66,10 +73,18 @@ class SnakeGame:
             self.renderer.tick()
         
         #gets the final states
-        state1 = self.get_state(1)
-        state2 = self.get_state(2)
-        
-        return (state1, reward1, self.game_state.done1), (state2, reward2, self.game_state.done2)
+        return tuple(
+            (self.get_state(i + 1), rewards[i], self.game_state.dones[i])
+            for i in range(self.num_snakes)
+        )
+
+    @property
+    def num_snakes(self):
+        return self.game_state.num_snakes
+
+    @property
+    def scores(self):
+        return self.game_state.scores
 
     @property
     def score1(self):
@@ -77,4 +92,4 @@ class SnakeGame:
 
     @property
     def score2(self):
-        return self.game_state.score2 
\ No newline at end of file
+        return self.game_state.score2
@@ -0,0 +1,52 @@
+"""
+Target network updates (hard syncs and soft Polyak averaging) for any number of agents.
+"""
+
+import torch
+
+
+class TargetNetworkUpdater:
+    """Keeps the target networks of one or more agents in sync with their Q-networks."""
+
+    def __init__(self, network_pairs, tau=None, update_freq=100):
+        """
+        Args:
+            network_pairs (list): (q_network, target_network) pairs, one per agent.
+            tau (float): The Polyak averaging factor used after every network update. If
+                None, the target networks are instead hard synced every update_freq steps.
+            update_freq (int): How many steps there are between hard syncs.
+        """
+        self.tau = tau
+        self.update_freq = update_freq
+
+        #the parameters of every agent are gathered into two flat lists once so each update is a single fused call over all of them
+        #the tensors are the same objects that the networks use, so the lists never go out of date when the networks are trained
+        self.q_params = []
+        self.target_params = []
+        for q_network, target_network in network_pairs:
+            self.q_params.extend(p.data for p in q_network.parameters())
+            self.target_params.extend(p.data for p in target_network.parameters())
+
+    @torch.no_grad()
+    def sync(self):
+        """Copies the Q-network weights into the target networks."""
+        torch._foreach_copy_(self.target_params, self.q_params)
+
+    @torch.no_grad()
+    def soft_update(self, tau):
+        """Moves the target network weights a fraction tau of the way towards the Q-network weights."""
+        #target = target + tau * (q - target), done in place for every parameter at once
+        torch._foreach_lerp_(self.target_params, self.q_params, tau)
+
+    def step(self, step_count, steps=1):
+        """Updates the target networks after a network update.
+
+        Args:
+            step_count (int): The number of steps taken so far.
+            steps (int): The number of steps since the last call, so a hard sync still
+                happens once every update_freq steps when the networks aren't updated every step.
+        """
+        if self.tau is not None:
+            self.soft_update(self.tau)
+        elif step_count // self.update_freq > (step_count - steps) // self.update_freq:
+            self.sync()
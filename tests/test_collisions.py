@@ -0,0 +1,157 @@
+"""
+Deterministic collision tests: every case places the snakes by hand and plays a single step.
+"""
+
+import random
+import pytest
+
+from src.snake import SnakeGame
+from src.game_config import REWARD_HEAD_COLLISION, REWARD_WIN, REWARD_DEATH
+
+ACTIONS = {'right': 0, 'left': 1, 'up': 2, 'down': 3}
+#far from every snake below, so no case eats it
+APPLE_POS = (400, 580)
+
+
+def make_game(snakes, directions):
+    """Returns a game with the given bodies (head first) and directions and the apple out of the way."""
+    game = SnakeGame(render=False, num_snakes=len(snakes), rng=random.Random(0))
+    state = game.game_state
+    state.snakes = [list(body) for body in snakes]
+    state.directions = list(directions)
+    state._rebuild_occupancy()
+    state.apple_pos = APPLE_POS
+    return game
+
+
+def step(game):
+    """Plays one step with every snake keeping its direction and returns the rewards and dones."""
+    results = game.step(*[ACTIONS[direction] for direction in game.game_state.directions])
+    return [reward for _, reward, _ in results], [done for _, _, done in results]
+
+
+def test_head_on_collision_scores_both_snakes():
+    game = make_game([[(100, 100)], [(140, 100)]], ['right', 'left'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_HEAD_COLLISION, REWARD_HEAD_COLLISION]
+    assert dones == [True, True]
+    assert game.scores == [1, 1]
+
+
+def test_single_segment_snakes_swap_cells_without_colliding():
+    #the heads pass each other between cells and never share one
+    game = make_game([[(100, 100)], [(120, 100)]], ['right', 'left'])
+    rewards, dones = step(game)
+    assert dones == [False, False]
+    assert game.game_state.snakes == [[(120, 100)], [(100, 100)]]
+    assert game.scores == [0, 0]
+
+
+def test_swapping_into_each_others_neck_kills_both():
+    game = make_game([[(100, 100), (80, 100)], [(120, 100), (140, 100)]], ['right', 'left'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_DEATH, REWARD_DEATH]
+    assert dones == [True, True]
+    assert game.scores == [0, 0]
+
+
+def test_same_step_deaths_both_get_the_death_reward():
+    game = make_game([[(0, 100)], [(780, 300)]], ['left', 'right'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_DEATH, REWARD_DEATH]
+    assert dones == [True, True]
+    assert game.scores == [0, 0]
+
+
+@pytest.mark.parametrize('dying', [0, 1])
+def test_one_death_is_a_win_for_the_other_snake(dying):
+    snakes = [[(100, 100)], [(300, 300)]]
+    directions = ['right', 'left']
+    #the dying snake runs into the wall
+    snakes[dying] = [(0, 100)] if dying == 0 else [(780, 300)]
+    directions[dying] = 'left' if dying == 0 else 'right'
+    game = make_game(snakes, directions)
+    rewards, dones = step(game)
+    assert rewards[dying] == REWARD_DEATH
+    assert rewards[1 - dying] == REWARD_WIN
+    assert dones == [True, True]
+    assert game.scores[dying] == 0 and game.scores[1 - dying] == 1
+
+
+def test_running_into_a_body_dies_but_a_vacated_tail_is_safe():
+    #snake 1 moves into the cell snake 2's tail leaves on the same step
+    game = make_game([[(100, 100), (80, 100)], [(140, 120), (140, 100), (120, 100)]], ['right', 'down'])
+    _, dones = step(game)
+    assert dones == [False, False]
+    #snake 2 moves into the middle of snake 1's body
+    game = make_game([[(120, 100), (100, 100), (80, 100)], [(100, 80)]], ['right', 'down'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_WIN, REWARD_DEATH]
+    assert dones == [True, True]
+
+
+def test_three_heads_on_one_cell_all_collide():
+    game = make_game([[(100, 100)], [(140, 100)], [(120, 120)]], ['right', 'left', 'up'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_HEAD_COLLISION] * 3
+    assert dones == [True, True, True]
+    assert game.scores == [1, 1, 1]
+
+
+def test_head_collision_ends_the_game_without_a_win_for_bystanders():
+    game = make_game([[(100, 100)], [(140, 100)], [(400, 300)]], ['right', 'left', 'up'])
+    rewards, dones = step(game)
+    assert rewards[:2] == [REWARD_HEAD_COLLISION, REWARD_HEAD_COLLISION]
+    assert rewards[2] not in (REWARD_WIN, REWARD_DEATH)
+    assert dones == [True, True, True]
+    assert game.scores == [1, 1, 0]
+
+
+def test_every_survivor_wins_when_one_of_several_snakes_dies():
+    game = make_game([[(0, 100)], [(300, 300)], [(500, 300)], [(300, 500)]], ['left', 'right', 'right', 'up'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_DEATH, REWARD_WIN, REWARD_WIN, REWARD_WIN]
+    assert dones == [True] * 4
+    assert game.scores == [0, 1, 1, 1]
+
+
+def test_a_head_collision_and_a_death_on_the_same_step():
+    #snakes 1 and 2 meet head on while snake 3 hits the wall, so only snake 4 survives
+    game = make_game([[(100, 100)], [(140, 100)], [(780, 300)], [(300, 500)]], ['right', 'left', 'right', 'up'])
+    rewards, dones = step(game)
+    assert rewards == [REWARD_HEAD_COLLISION, REWARD_HEAD_COLLISION, REWARD_DEATH, REWARD_WIN]
+    assert game.scores == [1, 1, 0, 1]
+
+
+@pytest.mark.parametrize('snakes, directions', [
+    ([[(100, 100)], [(140, 100)]], ['right', 'left']),
+    ([[(0, 100)], [(300, 300)]], ['left', 'right']),
+    ([[(300, 300)], [(780, 300)]], ['left', 'right']),
+    ([[(100, 100), (80, 100)], [(120, 100), (140, 100)]], ['right', 'left']),
+    ([[(100, 100)], [(300, 300)]], ['right', 'left']),
+])
+def test_two_snake_games_match_the_two_snake_accessors(snakes, directions):
+    #the same two snakes give the same outcome alone and with a third snake far away,
+    #apart from the win the third snake gets when one of them dies
+    two = make_game(snakes, directions)
+    three = make_game(snakes + [[(780, 20)]], directions + ['up'])
+    rewards2, dones2 = step(two)
+    rewards3, dones3 = step(three)
+    assert rewards3[:2] == rewards2 and dones3[:2] == dones2
+    assert three.scores[:2] == two.scores
+
+    state = two.game_state
+    assert (state.snake1_pos, state.snake2_pos) == tuple(tuple(body) for body in state.snakes)
+    assert (state.direction1, state.direction2) == tuple(state.directions)
+    assert (state.score1, state.score2) == tuple(state.scores)
+    assert (state.done1, state.done2) == tuple(state.dones)
+
+
+def test_two_snake_accessors_keep_the_occupancy_grid_in_sync():
+    game = make_game([[(100, 100)], [(300, 300)]], ['right', 'left'])
+    state = game.game_state
+    #the bodies can't be changed in place, only replaced, which rebuilds the grid
+    assert isinstance(state.snake1_pos, tuple)
+    state.snake1_pos = [(200, 200), (180, 200)]
+    assert state.is_occupied((180, 200)) and not state.is_occupied((100, 100))
+    assert state.snakes[0] == [(200, 200), (180, 200)]
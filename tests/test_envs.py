@@ -0,0 +1,53 @@
+"""
+Reproducibility tests for the Gymnasium env: a seeded reset plays the same episode whatever the random module is doing.
+"""
+
+import random
+import pytest
+import torch
+
+from src.dqn import DQN
+from src.envs import SnakeGymEnv, DQNOpponent
+
+#the agent's own moves, fixed so only the env and the opponents can make two runs differ
+AGENT_ACTIONS = [0, 0, 3, 3, 1, 1, 2, 2] * 25
+
+
+def make_opponent(name):
+    if name == 'dqn':
+        torch.manual_seed(0)
+        return DQNOpponent(DQN(13, 128, 4), epsilon=0.5)
+    return None if name == 'random' else name
+
+
+def play(opponent, global_seed):
+    """Plays one seeded episode after seeding the random module with global_seed and returns the trajectory."""
+    random.seed(global_seed)
+    env = SnakeGymEnv(opponent=make_opponent(opponent), num_snakes=3)
+    observation, _ = env.reset(seed=123)
+    trajectory = [observation.tolist()]
+    for action in AGENT_ACTIONS:
+        observation, reward, terminated, truncated, _ = env.step(action)
+        trajectory.append((observation.tolist(), reward, list(env.game.game_state.snakes)))
+        if terminated or truncated:
+            observation, _ = env.reset()
+            trajectory.append(observation.tolist())
+    return trajectory
+
+
+@pytest.mark.parametrize('opponent', ['random', 'bfs', 'dqn'])
+def test_seeded_reset_gives_the_same_trajectory(opponent):
+    assert play(opponent, global_seed=1) == play(opponent, global_seed=2)
+
+
+@pytest.mark.parametrize('opponent', ['random', 'bfs', 'dqn'])
+def test_stepping_leaves_the_random_module_alone(opponent):
+    env = SnakeGymEnv(opponent=make_opponent(opponent), num_snakes=3)
+    env.reset(seed=0)
+    random.seed(5)
+    before = random.getstate()
+    for action in AGENT_ACTIONS:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    assert random.getstate() == before
@@ -0,0 +1,97 @@
+"""
+N-step replay tests: the experiences left waiting when an episode is cut off are stored with partial returns.
+"""
+
+import pickle
+import numpy as np
+import pytest
+
+from src.memory import ReplayMemory, CompactReplayMemory
+
+GAMMA = 0.9
+
+
+def make_state(step):
+    #a distinct state per step that is heading right, so no action gets remapped as a turn-around
+    return [step / 100, 0.0, 0.0, 0.0, 0.0, 1, 0, 0, 0, 0, 0, 0, 0]
+
+
+def play(memory, rewards, done):
+    """Pushes one episode with the given rewards, ending it with done on the last step or cutting it off."""
+    for step, reward in enumerate(rewards):
+        last = step == len(rewards) - 1
+        memory.push(make_state(step), 0, reward, make_state(step + 1), done and last)
+    memory.end_episode()
+
+
+def stored(memory):
+    """Returns every stored experience as (first state, reward, next state, done, discount), ordered by first state."""
+    #CompactReplayMemory samples with replacement, so it takes a large batch to see every experience
+    batch_size = len(memory) * 50 if isinstance(memory, CompactReplayMemory) else len(memory)
+    np.random.seed(0)
+    states, _, rewards, next_states, dones, discounts = memory.sample_batch(batch_size)
+    rows = {(round(s[0] * 100), round(float(r), 5), round(n[0] * 100), bool(d), round(float(k), 5))
+            for s, r, n, d, k in zip(states, rewards, next_states, dones, discounts)}
+    return sorted(rows)
+
+
+@pytest.mark.parametrize('memory_class', [ReplayMemory, CompactReplayMemory])
+def test_cut_off_episode_keeps_partial_returns(memory_class):
+    memory = memory_class(100, n_step=3, gamma=GAMMA)
+    play(memory, [1.0, 2.0, 3.0, 4.0], done=False)
+    assert stored(memory) == [
+        (0, round(1 + 2 * GAMMA + 3 * GAMMA ** 2, 5), 3, False, round(GAMMA ** 3, 5)),
+        (1, round(2 + 3 * GAMMA + 4 * GAMMA ** 2, 5), 4, False, round(GAMMA ** 3, 5)),
+        #cut off after 4 steps, so the last two experiences bootstrap from state 4 after 2 steps and 1 step
+        (2, round(3 + 4 * GAMMA, 5), 4, False, round(GAMMA ** 2, 5)),
+        (3, 4.0, 4, False, GAMMA),
+    ]
+
+
+@pytest.mark.parametrize('memory_class', [ReplayMemory, CompactReplayMemory])
+def test_finished_episode_is_unchanged_by_end_episode(memory_class):
+    memory = memory_class(100, n_step=3, gamma=GAMMA)
+    play(memory, [1.0, 2.0, -1.0], done=True)
+    assert len(memory) == 3
+    assert [row[3] for row in stored(memory)] == [True, True, True]
+
+
+@pytest.mark.parametrize('memory_class', [ReplayMemory, CompactReplayMemory])
+def test_steps_survive_save_and_load(memory_class, tmp_path):
+    memory = memory_class(100, n_step=3, gamma=GAMMA)
+    play(memory, [1.0, 2.0, 3.0, 4.0], done=False)
+    path = str(tmp_path / ('memory.npz' if memory_class is CompactReplayMemory else 'memory.pkl'))
+    memory.save(path)
+    loaded = memory_class(100, n_step=3, gamma=GAMMA)
+    loaded.load(path)
+    assert stored(loaded) == stored(memory)
+
+
+def test_legacy_experiences_cover_n_step_steps(tmp_path):
+    path = str(tmp_path / 'memory.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump({'n_step': 3, 'gamma': GAMMA, 'experiences': [(make_state(0), 0, 1.0, make_state(3), False)]}, f)
+    memory = ReplayMemory(100, n_step=3, gamma=GAMMA)
+    memory.load(path)
+    assert np.allclose(memory.sample_batch(1)[5], GAMMA ** 3)
+
+
+@pytest.mark.parametrize('capacity', [4, 6, 10, 50])
+@pytest.mark.parametrize('n_step', [1, 3, 5])
+def test_compact_states_are_never_overwritten_while_in_use(capacity, n_step):
+    #a long cut off episode followed by short games used to wrap the state ring onto states the oldest experiences still used
+    plain = ReplayMemory(capacity, n_step=n_step, gamma=GAMMA)
+    compact = CompactReplayMemory(capacity, n_step=n_step, gamma=GAMMA)
+    for memory in (plain, compact):
+        play(memory, [1.0] * (3 * capacity + 1), done=False)
+        for episode in range(1, capacity):
+            memory.push(make_state(1000 + episode), 0, 1.0, make_state(2000 + episode), True)
+            memory.end_episode()
+
+    def pair(state, next_state, steps):
+        return tuple(np.round(state, 4)), tuple(np.round(next_state, 4)), int(steps)
+
+    expected = {pair(state, next_state, steps) for state, _, _, next_state, _, steps in plain.memory}
+    np.random.seed(0)
+    sampled = {pair(state, next_state, steps) for state, _, _, next_state, _, steps in compact.sample(capacity * 50)}
+    assert sampled == expected